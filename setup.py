@@ -17,6 +17,9 @@ setup(
         "PyYAML",
         "robotframework"
     ],
+    extras_require={
+        "async": ["aiohttp"],
+    },
     classifiers=[
         "Programming Language :: Python :: 3",
         "License :: OSI Approved :: MIT License",
@@ -0,0 +1,483 @@
+import asyncio
+from robotestrail.async_testrail_api_manager import AsyncTestRailApiManager
+from robotestrail.case_diff import CaseDiffStats, get_diff_snapshot
+from robotestrail.metrics import timed_phase
+from robotestrail.results_uploader import ResultsUploader
+from robotestrail.sync_journal import journaled
+from robotestrail.test_sync_manager import TestSyncManager
+
+
+class AsyncTestSyncManager(TestSyncManager):
+    """
+    TestSyncManager that runs the request-heavy phases on an asyncio event loop.
+
+    The metadata is still loaded by TestSyncManager. The section, test case and
+    result phases send all their requests through one AsyncTestRailApiManager,
+    so thousands of requests can be in flight without a thread per request.
+    The *_async coroutines can be gathered to sync several suites in one loop.
+    """
+
+    @journaled("sync_by_name")
+    def sync_robot_test_by_name(self):
+        asyncio.run(self.sync_robot_test_by_name_async())
+
+    @journaled("sync_by_id")
+    def sync_tests_by_id(self):
+        asyncio.run(self.sync_tests_by_id_async())
+
+    @journaled("results_by_id")
+    def set_results_by_id(self):
+        asyncio.run(self.set_results_by_id_async())
+
+    async def _gather(self, coroutines):
+        """
+        Runs the coroutines concurrently and logs the errors.
+
+        Returns:
+            list: The results in the order of the coroutines, None for failed ones.
+        """
+        results = await asyncio.gather(*coroutines, return_exceptions=True)
+        failed = 0
+        for result in results:
+            if isinstance(result, Exception):
+                failed += 1
+                self.logger.error(f"Error in async operation: {result}")
+        if failed:
+            self.logger.error(f"{failed} of {len(results)} operations failed")
+        return [None if isinstance(r, Exception) else r for r in results]
+
+    async def _run_blocking(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(None, func, *args)
+
+    async def sync_robot_test_by_name_async(self):
+        self.logger.info("Syncing robot tests with the TestRail by name (async engine)")
+        root_section_name = self.config.get_root_test_section_name()
+        project_id = self.project_id
+
+        async with AsyncTestRailApiManager(
+            self.config, self.tr_api.metrics, self.tr_api.journal
+        ) as api:
+            suite_id = (
+                await api.get_tr_suite_by_name(project_id, self.config.get_test_suite())
+            )["id"]
+
+            async def get_existing_cases_by_title():
+                return self._get_cases_by_title(
+                    (await api.get_cases(project_id, suite_id))["cases"]
+                )
+
+            existing_cases_task = asyncio.ensure_future(get_existing_cases_by_title())
+            section_index = await api.get_section_index(project_id, suite_id)
+            if root_section_name not in section_index:
+                section_index.add(
+                    await api.add_section(project_id, suite_id, root_section_name)
+                )
+            robot_tests = await self._run_blocking(self._get_robot_tests_inventory)
+            if self.config.get_sync_pipeline():
+                await self.sync_tests_by_name_pipelined_async(
+                    api, project_id, suite_id, robot_tests, section_index, existing_cases_task
+                )
+                return
+            await self.add_folders_to_testrail_async(
+                api,
+                project_id,
+                suite_id,
+                robot_tests,
+                self.config.get_source_control_link(),
+                section_index,
+            )
+            existing_cases_by_title = await existing_cases_task
+            await self.add_tests_to_testrail_async(
+                api, project_id, suite_id, existing_cases_by_title, robot_tests, section_index
+            )
+            await self.update_tests_in_testrail_async(
+                api, project_id, suite_id, existing_cases_by_title, robot_tests, section_index
+            )
+
+        # blocking reads and writes, run outside of the event loop
+        await self._run_blocking(
+            self.move_orphan_tests_to_orphan_folder,
+            project_id,
+            suite_id,
+            robot_tests,
+            section_index,
+        )
+
+    def _schedule_sections_async(
+        self, api, project_id, suite_id, robot_tests, source_control_link_root, section_index
+    ):
+        """
+        Schedules the creation of the missing sections of the robot tests.
+
+        Every missing section waits only for its own parent instead of the
+        whole previous level.
+
+        Returns:
+            tuple: The creation tasks by section path and the update
+                coroutines of the existing sections.
+        """
+        local_section_paths = self._get_local_section_paths(robot_tests)
+        folder_paths = self._get_folder_paths(local_section_paths)
+        missing_paths, existing_paths = self._get_section_paths_to_sync(
+            local_section_paths, section_index
+        )
+        created_sections = {}
+
+        async def create_section(missing_path):
+            parent_id = None
+            if " > " in missing_path:
+                parent_path = missing_path.rsplit(" > ", 1)[0]
+                if parent_path in created_sections:
+                    await created_sections[parent_path]
+                parent_id = section_index.get_id(parent_path)
+            description = self._get_section_description(
+                missing_path, folder_paths, source_control_link_root
+            )
+            section_name = missing_path.split(">")[-1].strip()
+            return section_index.add(
+                await api.add_section(
+                    project_id, suite_id, section_name, parent_id, description
+                )
+            )
+
+        async def update_section(existing_section_path):
+            section = section_index.get(existing_section_path)
+            description = self._get_section_description(
+                existing_section_path, folder_paths, source_control_link_root
+            )
+            section_name = existing_section_path.split(">")[-1].strip()
+            if section.get("description") == description:
+                self.logger.debug(f"Section unchanged: {section_name}")
+                return False
+            await api.update_section(section["id"], section_name, description=description)
+            section["description"] = description
+            return True
+
+        for path in missing_paths:
+            created_sections[path] = asyncio.ensure_future(create_section(path))
+        return created_sections, [update_section(path) for path in existing_paths]
+
+    @timed_phase("sections")
+    async def add_folders_to_testrail_async(
+        self,
+        api,
+        project_id,
+        suite_id,
+        robot_tests,
+        source_control_link_root,
+        section_index=None,
+    ):
+        if section_index is None:
+            section_index = await api.get_section_index(project_id, suite_id)
+        created_sections, section_updates = self._schedule_sections_async(
+            api, project_id, suite_id, robot_tests, source_control_link_root, section_index
+        )
+        results = await self._gather(list(created_sections.values()) + section_updates)
+        self._log_section_updates(results[len(created_sections):])
+        return section_index
+
+    async def _add_test_case_by_name_async(self, api, test, section_index):
+        fields = dict(
+            self._get_name_sync_case_fields(test),
+            section_id=section_index.get_id(test["formatted_path"]),
+        )
+        case = await api.add_test_case(**fields)
+        self._remember_case_state(case["id"], fields)
+        self.logger.info(f"Test added: {test['title']}")
+
+    async def _update_test_case_by_name_async(
+        self, api, test, existing_case, section_index, stats=None
+    ):
+        await self._update_test_case_if_changed_async(
+            api,
+            existing_case["id"],
+            dict(
+                self._get_name_sync_case_fields(test),
+                section_id=section_index.get_id(test["formatted_path"]),
+            ),
+            existing_case,
+            stats,
+        )
+
+    @timed_phase("add")
+    async def add_tests_to_testrail_async(
+        self,
+        api,
+        project_id,
+        suite_id,
+        existing_cases_by_title,
+        robot_tests,
+        section_index=None,
+    ):
+        tests_to_add = [
+            t for t in robot_tests["tests"] if t["title"] not in existing_cases_by_title
+        ]
+        if section_index is None:
+            section_index = await api.get_section_index(project_id, suite_id)
+
+        self.logger.debug(
+            f"Adding tests to TestRail\nThe following number of tests will be added: {len(tests_to_add)}"
+        )
+        await self._gather(
+            [
+                self._add_test_case_by_name_async(api, test, section_index)
+                for test in tests_to_add
+            ]
+        )
+
+    @timed_phase("update")
+    async def update_tests_in_testrail_async(
+        self,
+        api,
+        project_id,
+        suite_id,
+        existing_cases_by_title,
+        robot_tests,
+        section_index=None,
+    ):
+        tests_to_update = [
+            t for t in robot_tests["tests"] if t["title"] in existing_cases_by_title
+        ]
+        if section_index is None:
+            section_index = await api.get_section_index(project_id, suite_id)
+        stats = CaseDiffStats()
+
+        self.logger.info(
+            f"Updating tests in TestRail\nThe following number of tests will be updated: {len(tests_to_update)}"
+        )
+        await self._gather(
+            [
+                self._update_test_case_by_name_async(
+                    api, test, existing_cases_by_title[test["title"]], section_index, stats
+                )
+                for test in tests_to_update
+            ]
+        )
+        self.logger.info(f"Test case updates: {stats}")
+
+    @timed_phase("pipeline")
+    async def sync_tests_by_name_pipelined_async(
+        self, api, project_id, suite_id, robot_tests, section_index, existing_cases_task
+    ):
+        """
+        Syncs the sections, test cases and orphans by name as one pipeline.
+
+        See TestSyncManager.sync_tests_by_name_pipelined: every test waits
+        only for the creation of its own section.
+        """
+        created_sections, section_updates = self._schedule_sections_async(
+            api,
+            project_id,
+            suite_id,
+            robot_tests,
+            self.config.get_source_control_link(),
+            section_index,
+        )
+        stats = CaseDiffStats()
+
+        async def sync_test(test):
+            section_task = created_sections.get(test["formatted_path"])
+            if section_task is not None:
+                await section_task
+            existing_case = (await existing_cases_task).get(test["title"])
+            if existing_case is None:
+                await self._add_test_case_by_name_async(api, test, section_index)
+            else:
+                await self._update_test_case_by_name_async(
+                    api, test, existing_case, section_index, stats
+                )
+
+        results = await self._gather(
+            list(created_sections.values())
+            + section_updates
+            + [sync_test(test) for test in robot_tests["tests"]]
+            + [
+                self._run_blocking(
+                    self.move_orphan_tests_to_orphan_folder,
+                    project_id,
+                    suite_id,
+                    robot_tests,
+                    section_index,
+                )
+            ]
+        )
+        self._log_section_updates(
+            results[len(created_sections) : len(created_sections) + len(section_updates)]
+        )
+        self.logger.info(f"Test case updates: {stats}")
+
+    async def _update_test_case_if_changed_async(
+        self, api, case_id, fields, existing_case, stats=None
+    ):
+        changes = self._get_case_changes(case_id, fields, existing_case, stats)
+        if changes is None:
+            self.logger.debug(f"TC unchanged: {fields.get('title')} | Case ID: C{case_id}")
+            return
+        await api.update_case_fields(case_id, changes, fields.get("title"))
+        self._remember_case_state(case_id, fields)
+
+    async def sync_tests_by_id_async(self):
+        self.logger.info("Starting test sync process (async engine)")
+        self.logger.info(f"Project ID: {self.project_id}")
+
+        robot_tests = await self._run_blocking(self._get_robot_tests_inventory)
+
+        self._log_tests_without_tr_id(robot_tests["tests_without_tr_id"])
+        self._log_tests_with_multiple_tr_ids(robot_tests["tests_with_multiple_tr_ids"])
+        self._log_tests_with_duplicate_tr_ids(robot_tests["all_tr_ids"])
+
+        async with AsyncTestRailApiManager(
+            self.config, self.tr_api.metrics, self.tr_api.journal
+        ) as api:
+            existing_cases = {}
+            if self._should_diff_with_server():
+                suite = await api.get_tr_suite_by_name(
+                    self.project_id, self.config.get_test_suite()
+                )
+                if suite is None:
+                    self._log_no_suite_to_diff()
+                else:
+                    cases = (await api.get_cases(self.project_id, suite["id"]))["cases"]
+                    for case in cases:
+                        existing_cases[str(case["id"])] = get_diff_snapshot(
+                            case, self.diff_fields
+                        )
+            stats = CaseDiffStats()
+
+            def update(tr_id, fields):
+                case_id = self._get_tr_case_id(tr_id)
+                return self._update_test_case_if_changed_async(
+                    api, case_id, fields, existing_cases.get(case_id), stats
+                )
+
+            # The automatedby emails are resolved with blocking requests, so
+            # the fields are built outside of the event loop
+            case_fields = await self._run_blocking(self._get_id_sync_updates, robot_tests)
+            updates = [update(tr_id, fields) for tr_id, fields in case_fields]
+            self.logger.info(
+                f"Syncing tests by TestRail IDs\nThe following number of test cases will be synced: {len(updates)}"
+            )
+            await self._gather(updates)
+            self.logger.info(f"Test case updates: {stats}")
+
+    def _get_id_sync_updates(self, robot_tests):
+        """Returns the (TestRail ID, case fields) pairs written by the sync by ID."""
+        updates = []
+        for test in robot_tests["tests_with_one_tr_id"]:
+            updates.append((test["tr_ids"][0], self._get_id_sync_case_fields(test)))
+        for test in robot_tests["tests_with_multiple_tr_ids"]:
+            for tr_id in test["tr_ids"]:
+                updates.append((tr_id, self._get_multiple_ids_sync_case_fields(test)))
+        return updates
+
+    async def set_results_by_id_async(self):
+        self.logger.info("Starting set tests results by id process (async engine)")
+        project_id = self.project_id
+        self.logger.info(f"Project ID: {project_id}")
+
+        dry_run_tests = await self._run_blocking(self._get_robot_tests_inventory, "results")
+        all_case_ids = [t[1:] for t in dry_run_tests["all_tr_ids"]]
+        output_file_path = self.config.get_robot_output_xml_file_path()
+        results = self._iter_results_by_tr_ids(
+            self._iter_robot_tests_from_output(output_file_path)
+        )
+        results_uploader = ResultsUploader(self.tr_api, self.config, "results_by_id")
+        run_id = results_uploader.load_run_id(output_file_path)
+
+        async with AsyncTestRailApiManager(
+            self.config, self.tr_api.metrics, self.tr_api.journal
+        ) as api:
+            if run_id is None:
+                run_id = await self._add_test_run_for_results_by_id_async(
+                    api, project_id, all_case_ids
+                )
+                if run_id is None:
+                    return
+                results_uploader.start(run_id)
+
+            self.logger.info(f"Adding results to test run: {run_id}")
+            await self._upload_results_async(api, results_uploader, run_id, results)
+
+    @timed_phase("results")
+    async def _upload_results_async(self, api, results_uploader, run_id, results):
+        """
+        Uploads the results to the run, like ResultsUploader.upload.
+
+        The output.xml is streamed one chunk at a time in a thread, off the
+        event loop, and at most two chunks per worker are held in memory.
+        """
+        async def upload_chunk(key, chunk):
+            await api.add_results_for_cases(run_id, {"results": chunk})
+            results_uploader.mark_done(key)
+            return len(chunk)
+
+        chunks = results_uploader.iter_pending_chunks(results)
+        failed = 0
+        uploaded = 0
+        pending = set()
+        try:
+            while True:
+                item = await self._run_blocking(next, chunks, None)
+                if item is None:
+                    break
+                if len(pending) >= results_uploader.workers * 2:
+                    done, pending = await asyncio.wait(
+                        pending, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    failed, uploaded = self._collect_uploads(done, failed, uploaded)
+                pending.add(asyncio.ensure_future(upload_chunk(*item)))
+        finally:
+            # the chunks already sent are finished even if reading the output fails
+            if pending:
+                await asyncio.wait(pending)
+        failed, uploaded = self._collect_uploads(pending, failed, uploaded)
+        self.logger.info(f"Uploaded {uploaded} results to test run: {run_id}")
+        results_uploader.finish(failed)
+
+    def _collect_uploads(self, tasks, failed, uploaded):
+        for task in tasks:
+            if task.exception() is not None:
+                failed += 1
+                self.logger.error(f"Error uploading a results chunk: {task.exception()}")
+            else:
+                uploaded += task.result()
+        return failed, uploaded
+
+    async def _add_test_run_for_results_by_id_async(self, api, project_id, all_case_ids):
+        milestone_id = self._get_milestone_id_by_name(
+            self.config.get_test_plan_milestone_name()
+        )
+        test_plan = await api.add_plan(
+            project_id,
+            f"{self.config.get_test_plan_name()} | {self._get_run_timestamp()}",
+            self.config.get_test_plan_description(),
+            milestone_id=milestone_id,
+        )
+        suite = await api.get_tr_suite_by_name(project_id, self.config.get_test_suite())
+        test_run_name = f"{self.config.get_test_run_name()} - {self._get_run_timestamp()}"
+
+        assignedto_id = None
+        if self.config.get_test_run_assignedto_email():
+            user = await api.get_user_by_email(
+                self.config.get_test_run_assignedto_email()
+            )
+            assignedto_id = user["id"]
+
+        try:
+            test_run = await api.add_run_to_plan(
+                plan_id=test_plan["id"],
+                suite_id=suite["id"],
+                name=test_run_name,
+                description=self.config.get_test_run_description(),
+                assignedto_id=assignedto_id,
+                include_all=False,
+                case_ids=all_case_ids,
+            )
+        except Exception as e:
+            self.logger.error(
+                f"Project '{self.config.get_project_name()}' does not have test plan with name '{self.config.get_test_plan_name()}'\nError adding test run to test plan: {e}"
+            )
+            return None
+
+        self.logger.info(f"Test run created: '{test_run_name}'")
+        return test_run["runs"][0]["id"]
@@ -0,0 +1,335 @@
+import asyncio
+import json
+import os
+import time
+from robotestrail.logging_config import setup_logging
+from robotestrail.metrics import Metrics
+from robotestrail.rate_governor import (
+    RateGovernor,
+    THROTTLE_STATUS_CODES,
+    parse_retry_after,
+)
+from robotestrail.section_index import SectionIndex
+from robotestrail.testrail_api_manager import TestRailApiManager, get_endpoint_name
+
+try:
+    import aiohttp
+except ImportError:  # pragma: no cover - optional dependency
+    aiohttp = None
+
+
+class AsyncResponse:
+    """Body and status of a finished aiohttp response."""
+
+    def __init__(self, status_code, content, headers):
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class AsyncTestRailApiManager:
+    """
+    asyncio counterpart of TestRailApiManager.
+
+    All requests share one aiohttp session and run on the event loop. The
+    number of in-flight requests is bounded by a semaphore sized to
+    testrail.async_concurrency; throttled responses are retried the same way
+    as in the threaded client. Pass the Metrics and the SyncJournal of the
+    threaded client to get one report and one journal for the whole run.
+    """
+
+    def __init__(self, config, metrics=None, journal=None):
+        if aiohttp is None:
+            raise ImportError(
+                "The async engine requires aiohttp: pip install robotframework-testrail-sync[async]"
+            )
+        self.logger = setup_logging()
+        self.config = config
+        self.base_url = self.config.get_testrail_url()
+        self.user = self.config.get_testrail_user()
+        try:
+            self.api_key = os.getenv(self.config.get_testrail_api_key_env_var())
+        except Exception as e:
+            self.logger.error(f"Error getting TestRail API key from environment variable: {e}")
+        self.concurrency = self.config.get_testrail_async_concurrency()
+        # The governor is only used for its backoff policy here, the semaphore
+        # limits the in-flight requests on the event loop
+        self.governor = RateGovernor(
+            initial_limit=self.concurrency,
+            adaptive=False,
+            max_retries=self.config.get_testrail_max_retries(),
+            backoff_base=self.config.get_testrail_backoff_base(),
+            backoff_max=self.config.get_testrail_backoff_max(),
+        )
+        self.metrics = metrics or Metrics(enabled=self.config.get_metrics_enabled())
+        self.journal = journal
+        self.session = None
+        self._semaphore = None
+        self._paused_until = 0.0
+        self.logger.debug("AsyncTestRailApiManager initialized")
+
+    async def __aenter__(self):
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def open(self):
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency,
+            force_close=not self.config.get_testrail_keep_alive(),
+        )
+        timeout = aiohttp.ClientTimeout(
+            sock_connect=self.config.get_testrail_connect_timeout(),
+            sock_read=self.config.get_testrail_read_timeout(),
+        )
+        self.session = aiohttp.ClientSession(
+            connector=connector,
+            timeout=timeout,
+            auth=aiohttp.BasicAuth(self.user, self.api_key or ""),
+        )
+
+    async def close(self):
+        if self.session is not None:
+            await self.session.close()
+            self.session = None
+
+    async def _request(self, method, url, **kwargs):
+        endpoint = get_endpoint_name(url)
+        bytes_sent = len(json.dumps(kwargs["json"])) if "json" in kwargs else 0
+        attempt = 0
+        while True:
+            async with self._semaphore:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    await asyncio.sleep(pause)
+                start = time.monotonic()
+                try:
+                    async with self.session.request(method, url, **kwargs) as raw_response:
+                        response = AsyncResponse(
+                            raw_response.status, await raw_response.read(), raw_response.headers
+                        )
+                except aiohttp.ClientError:
+                    self.metrics.record_request(endpoint, "error", time.monotonic() - start)
+                    raise
+            self.metrics.record_request(
+                endpoint,
+                response.status_code,
+                time.monotonic() - start,
+                bytes_sent,
+                len(response.content),
+            )
+
+            if response.status_code not in THROTTLE_STATUS_CODES:
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            if retry_after:
+                self._paused_until = max(self._paused_until, time.monotonic() + retry_after)
+            if attempt >= self.governor.max_retries:
+                self.logger.error(
+                    f"Giving up after {attempt} retries: {method} {url} | Status Code: {response.status_code}"
+                )
+                return response
+
+            delay = self.governor.retry_delay(attempt, retry_after)
+            self.metrics.record_retry(endpoint)
+            self.logger.warning(
+                f"TestRail responded with {response.status_code}, retrying in {delay:.1f}s: {method} {url}"
+            )
+            await asyncio.sleep(delay)
+            attempt += 1
+
+    async def _get(self, url, **kwargs):
+        return await self._request("GET", url, **kwargs)
+
+    async def _post(self, url, **kwargs):
+        if self.journal is None:
+            return await self._request("POST", url, **kwargs)
+        endpoint = get_endpoint_name(url)
+        journal_key, replayed = self.journal.before_call(endpoint, url, kwargs.get("json"))
+        if replayed is not None:
+            return replayed
+        response = await self._request("POST", url, **kwargs)
+        self.journal.after_call(endpoint, journal_key, response)
+        return response
+
+    async def _get_json(self, url):
+        response = await self._get(url)
+        if response.status_code != 200:
+            raise Exception(f"Failed to get {url}: {response.status_code} {response.text}")
+        return response.json()
+
+    async def _iter_pages(self, url, key):
+        page = await self._get_json(url)
+        while True:
+            # Older TestRail versions return a plain list without pagination
+            if isinstance(page, list):
+                for item in page:
+                    yield item
+                return
+
+            for item in page.get(key, []):
+                yield item
+
+            next_link = (page.get("_links") or {}).get("next")
+            if not next_link:
+                return
+            page = await self._get_json(f"{self.base_url}/index.php?{next_link}")
+
+    async def get_cases(self, project_id, suite_id):
+        url = f"{self.base_url}/index.php?/api/v2/get_cases/{project_id}&suite_id={suite_id}"
+        return {"cases": [case async for case in self._iter_pages(url, "cases")]}
+
+    async def get_sections(self, project_id, suite_id):
+        url = f"{self.base_url}/index.php?/api/v2/get_sections/{project_id}&suite_id={suite_id}"
+        return {"sections": [section async for section in self._iter_pages(url, "sections")]}
+
+    async def get_section_index(self, project_id, suite_id):
+        return SectionIndex((await self.get_sections(project_id, suite_id))["sections"])
+
+    async def get_sections_with_formatted_path(self, project_id, suite_id):
+        return (await self.get_section_index(project_id, suite_id)).sections
+
+    async def get_tr_suite_by_name(self, project_id, suite_name):
+        url = f"{self.base_url}/index.php?/api/v2/get_suites/{project_id}"
+        for suite in await self._get_json(url):
+            if suite["name"] == suite_name:
+                return suite
+        return None
+
+    async def get_user_by_email(self, email):
+        url = f"{self.base_url}/index.php?/api/v2/get_user_by_email&email={email}"
+        return await self._get_json(url)
+
+    async def add_section(self, project_id, suite_id, section_name, parent_id=None, description=None):
+        url = f"{self.base_url}/index.php?/api/v2/add_section/{project_id}"
+        data = {
+            "suite_id": suite_id,
+            "name": section_name,
+            "description": description,
+            "parent_id": parent_id,
+        }
+        response = await self._post(url, json=data)
+        if response.status_code == 200:
+            section = response.json()
+            self.logger.info(f"Section added: '{section_name}' with ID {section['id']}")
+            return section
+        else:
+            raise Exception(
+                f"Failed to add section: {response.status_code} {response.text}"
+            )
+
+    async def update_section(self, section_id, section_name, description=None):
+        url = f"{self.base_url}/index.php?/api/v2/update_section/{section_id}"
+        data = {
+            "name": section_name,
+            "description": description,
+        }
+        response = await self._post(url, json=data)
+        if response.status_code == 200:
+            section = response.json()
+            self.logger.debug(f"Section updated: '{section_name}' | S{section['id']} | {section['description']}")
+            return section
+        else:
+            raise Exception(
+                f"Failed to update section: {response.status_code} {response.text}"
+            )
+
+    async def add_test_case(self, section_id, title, steps, custom_automation_type, refs=None, priority_id=None, type_id=None, estimate=None, milestone_id=None, preconditions=None, custom_fields=None):
+        url = f"{self.base_url}/index.php?/api/v2/add_case/{section_id}"
+        data = {
+            "title": title,
+            "custom_automation_type": custom_automation_type,
+            "custom_steps": steps,
+            "refs": refs,
+            "priority_id": priority_id,
+            "type_id": type_id,
+            "estimate": estimate,
+            "milestone_id": milestone_id,
+            "custom_preconds": preconditions
+        }
+        data.update(custom_fields or {})
+        response = await self._post(url, json=data)
+        if response.status_code == 200:
+            case = response.json()
+            self.logger.debug(f"Test case added: '{title}' | C{case['id']}")
+            return case
+        else:
+            raise Exception(
+                f"Failed to add test case: {response.status_code} {response.text}"
+            )
+
+    async def update_test_case(self, case_id, **fields):
+        payload = TestRailApiManager.build_update_case_payload(**fields)
+        await self.update_case_fields(case_id, payload, fields.get("title"))
+
+    async def update_case_fields(self, case_id, payload, title=None):
+        url = f"{self.base_url}/index.php?/api/v2/update_case/{case_id}"
+        response = await self._post(url, json=payload)
+        if response.status_code == 200:
+            self.logger.info(f"TC updated: {title} | Case ID: C{case_id}")
+        else:
+            self.logger.error(f"Failed to update test case: {title} | Case ID: C{case_id} | Status Code: {response.status_code} | Response: {response.text}")
+            raise Exception(
+                f"Failed to update test case: {response.status_code} {response.text}"
+            )
+
+    async def add_plan(self, project_id, name, description=None, milestone_id=None, entries=None):
+        url = f"{self.base_url}/index.php?/api/v2/add_plan/{project_id}"
+        data = {
+            "name": name,
+            "description": description,
+            "milestone_id": milestone_id,
+            "entries": entries
+        }
+        response = await self._post(url, json=data)
+        if response.status_code == 200:
+            self.logger.info(f"Test plan created: {name}")
+            return response.json()
+        else:
+            self.logger.error(f"Failed to create test plan: {name} | Status Code: {response.status_code} | Response: {response.text}")
+            raise Exception(
+                f"Failed to create test plan: {response.status_code} {response.text}"
+            )
+
+    async def add_run_to_plan(self, plan_id, suite_id, name, description=None, case_ids=None, milestone_id=None, assignedto_id=None, include_all=False, refs=None):
+        url = f"{self.base_url}/index.php?/api/v2/add_plan_entry/{plan_id}"
+        data = {
+            "suite_id": suite_id,
+            "name": name,
+            "description": description,
+            "include_all": include_all,
+            "case_ids": case_ids,
+            "milestone_id": milestone_id,
+            "assignedto_id": assignedto_id,
+            "refs": refs
+        }
+        response = await self._post(url, json=data)
+        if response.status_code == 200:
+            return response.json()
+        else:
+            self.logger.error(f"Failed to add test run to test plan: {name} | Status Code: {response.status_code} | Response: {response.text}")
+            raise Exception(
+                f"Failed to add test run to test plan: {response.status_code} {response.text}"
+            )
+
+    async def add_results_for_cases(self, run_id, payload):
+        url = f"{self.base_url}/index.php?/api/v2/add_results_for_cases/{run_id}"
+        response = await self._post(url, json=payload)
+        if response.status_code == 200:
+            self.logger.info(f"Results added to test run: {run_id}")
+        else:
+            self.logger.error(f"Failed to add results to test run: {run_id} | Status Code: {response.status_code} | Response: {response.text}")
+            raise Exception(
+                f"Failed to add results to test run: {response.status_code} {response.text}"
+            )
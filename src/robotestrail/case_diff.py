@@ -0,0 +1,99 @@
+import re
+import threading
+
+# Fields of an update_case payload that are compared with the existing case
+DIFF_FIELDS = (
+    "title",
+    "section_id",
+    "custom_steps",
+    "custom_preconds",
+    "refs",
+    "priority_id",
+    "type_id",
+    "estimate",
+    "milestone_id",
+    "custom_automation_type",
+    "custom_automatedby",
+    "custom_customer",
+)
+
+TIMESPAN_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400, "w": 604800}
+TIMESPAN_PART_PATTERN = re.compile(r"(\d+)\s*([smhdw])")
+
+
+def normalize_estimate(value):
+    """
+    Returns a timespan ("1m 30s", "90s", "1h30m") in seconds.
+
+    TestRail stores the estimate in its own format, e.g. "90s" is returned as
+    "1m 30s". Values that are not a timespan are returned as stripped strings.
+    """
+    text = str(value).strip().lower()
+    if text.isdigit():
+        return int(text)
+    parts = TIMESPAN_PART_PATTERN.findall(text)
+    if not parts or TIMESPAN_PART_PATTERN.sub("", text).strip():
+        return text
+    return sum(int(number) * TIMESPAN_UNITS[unit] for number, unit in parts)
+
+
+def get_diff_snapshot(case, fields=DIFF_FIELDS):
+    """Returns the id and the compared fields of a case, to keep fewer fields in memory."""
+    return {k: v for k, v in case.items() if k == "id" or k in fields}
+
+
+def normalize_value(field, value):
+    if value is None or value == "":
+        return None
+    if field == "estimate":
+        return normalize_estimate(value)
+    return str(value).replace("\r\n", "\n").strip()
+
+
+def diff_case(payload, existing_case, fields=DIFF_FIELDS):
+    """
+    Returns the fields of the payload that differ from the existing case.
+
+    Only the compared fields found in the existing case are compared; other fields
+    of the payload (or fields the case does not expose) are always returned.
+
+    Args:
+        payload (dict): The update_case payload, see build_update_case_payload.
+        existing_case (dict): The case as returned by get_cases.
+        fields (tuple): The compared fields, e.g. with the custom fields of
+            the tag rules.
+
+    Returns:
+        dict: The changed fields, empty if the case is up to date.
+    """
+    changes = {}
+    for field, value in payload.items():
+        if field not in fields or field not in existing_case:
+            changes[field] = value
+        elif normalize_value(field, value) != normalize_value(field, existing_case[field]):
+            changes[field] = value
+    return changes
+
+
+class CaseDiffStats:
+    """
+    Thread-safe counts of the diffed cases.
+
+    changed: the case differs and its changed fields were written.
+    unchanged: the case is up to date, no write was sent.
+    skipped: the case was not among the fetched cases, so it was not compared
+        and the whole payload was written.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.changed = 0
+        self.unchanged = 0
+        self.skipped = 0
+
+    def add(self, outcome):
+        with self._lock:
+            setattr(self, outcome, getattr(self, outcome) + 1)
+
+    def __str__(self):
+        return f"changed: {self.changed}, unchanged: {self.unchanged}, skipped: {self.skipped}"
@@ -3,10 +3,12 @@ from robotestrail.logging_config import setup_logging
 
 
 class ConfigManager:
-    def __init__(self, config_file):
+    def __init__(self, config_file, options=None):
         self.logger = setup_logging()
         self.config_file = config_file
         self.config = self.load_config()
+        # options given on the command line
+        self.options = options or {}
 
     def load_config(self):
         with open(self.config_file, "r") as stream:
@@ -33,6 +35,29 @@ class ConfigManager:
     def get_robot_output_xml_file_path(self):
         return self.config["paths"]["output_xml_file"]
 
+    def get_tag_rules(self):
+        return self.config.get("tags", {}).get("rules", [])
+
+    def get_tr_id_pattern(self):
+        return self.config.get("tags", {}).get("tr_id_pattern", None)
+
+    def get_robot_inventory_mode(self):
+        return self.config.get("robot", {}).get("inventory_mode", "dryrun")
+
+    def get_robot_inventory_workers(self):
+        return self.config.get("robot", {}).get("inventory_workers", 1)
+
+    def get_robot_inventory_shard_strategy(self):
+        return self.config.get("robot", {}).get("shard_strategy", "suite")
+
+    def get_robot_parse_cache_enabled(self):
+        return self.config.get("robot", {}).get("parse_cache", {}).get("enabled", True)
+
+    def get_robot_parse_cache_path(self):
+        return self.config.get("robot", {}).get("parse_cache", {}).get(
+            "path", ".robotestrail_parse_cache.json.gz"
+        )
+
     def get_default_type_id(self):
         return self.config.get("testrail_defaults", {}).get("type_id", None)
 
@@ -57,6 +82,122 @@ class ConfigManager:
     def get_max_workers(self):
         return self.config["testrail"]["max_workers"]
 
+    def get_testrail_pool_size(self):
+        pool_size = self.config.get("testrail", {}).get("pool_size", None)
+        return pool_size or self.get_testrail_max_concurrency() or 1
+
+    def get_testrail_keep_alive(self):
+        return self.config.get("testrail", {}).get("keep_alive", True)
+
+    def get_testrail_connect_timeout(self):
+        return self.config.get("testrail", {}).get("connect_timeout", 10)
+
+    def get_testrail_read_timeout(self):
+        return self.config.get("testrail", {}).get("read_timeout", 60)
+
+    def get_testrail_prefetch_pages(self):
+        return self.config.get("testrail", {}).get("prefetch_pages", True)
+
+    # rate limit
+    def get_testrail_adaptive_concurrency(self):
+        return self.config.get("testrail", {}).get("rate_limit", {}).get("adaptive", True)
+
+    def get_testrail_min_concurrency(self):
+        return self.config.get("testrail", {}).get("rate_limit", {}).get("min_concurrency", 1)
+
+    def get_testrail_max_concurrency(self):
+        max_concurrency = self.config.get("testrail", {}).get("rate_limit", {}).get(
+            "max_concurrency", None
+        )
+        if max_concurrency:
+            return max_concurrency
+        if self.get_testrail_adaptive_concurrency():
+            return (self.get_max_workers() or 1) * 4
+        return self.get_max_workers() or 1
+
+    def get_testrail_max_retries(self):
+        return self.config.get("testrail", {}).get("rate_limit", {}).get("max_retries", 5)
+
+    def get_testrail_backoff_base(self):
+        return self.config.get("testrail", {}).get("rate_limit", {}).get("backoff_base", 1.0)
+
+    def get_testrail_backoff_max(self):
+        return self.config.get("testrail", {}).get("rate_limit", {}).get("backoff_max", 60.0)
+
+    def get_testrail_async_concurrency(self):
+        return self.config.get("testrail", {}).get("async_concurrency", 100)
+
+    # results upload
+    def get_results_chunk_size(self):
+        return self.config.get("results", {}).get("chunk_size", 250)
+
+    def get_results_chunk_max_bytes(self):
+        return self.config.get("results", {}).get("chunk_max_bytes", 1000000)
+
+    def get_results_upload_workers(self):
+        return self.config.get("results", {}).get("upload_workers", None)
+
+    def get_results_checkpoint_file(self):
+        return self.config.get("results", {}).get(
+            "checkpoint_file", ".robotestrail_results_checkpoint.json"
+        )
+
+    # sync
+    def get_diff_updates(self):
+        return self.config.get("sync", {}).get("diff_updates", True)
+
+    def get_sync_pipeline(self):
+        return self.options.get("pipeline") or self.config.get("sync", {}).get(
+            "pipeline", False
+        )
+
+    # state store
+    def get_state_path(self):
+        return self.config.get("state", {}).get("path", None)
+
+    def get_full_sync(self):
+        return self.options.get("full", False)
+
+    # journal
+    def get_journal_enabled(self):
+        return self.config.get("journal", {}).get("enabled", True)
+
+    def get_journal_path(self):
+        return self.config.get("journal", {}).get("path", ".robotestrail_journal.jsonl")
+
+    def get_resume(self):
+        return self.options.get("resume", False)
+
+    # metrics
+    def get_metrics_enabled(self):
+        return self.config.get("metrics", {}).get("enabled", True)
+
+    def get_metrics_output_file(self):
+        return self.config.get("metrics", {}).get("output_file", None)
+
+    def get_metrics_format(self):
+        return self.config.get("metrics", {}).get("format", "json")
+
+    # metadata cache
+    def get_metadata_cache_enabled(self):
+        return self.config.get("cache", {}).get("enabled", True)
+
+    def get_metadata_cache_path(self):
+        return self.config.get("cache", {}).get(
+            "path", "~/.cache/robotestrail/metadata.json"
+        )
+
+    def get_metadata_cache_ttl(self):
+        return self.config.get("cache", {}).get("ttl", 600)
+
+    def get_refresh_cache(self):
+        return self.options.get("refresh_cache", False)
+
+    def get_engine(self):
+        return self.options.get("engine") or self.config.get("testrail", {}).get(
+            "engine", "threads"
+        )
+
     def get_default_custom_automation_type(self):
         return self.config.get("testrail_defaults", {}).get(
             "custom_automation_type", None
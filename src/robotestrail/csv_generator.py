@@ -1,7 +1,9 @@
 import csv
 from robotestrail.logging_config import *
+from robotestrail.parse_cache import ParseCache
+from robotestrail.tag_rules import TagRules
 from robotestrail.robot_framework_utils import (
-    run_dryrun_and_get_tests_with_additional_info,
+    get_robot_tests_with_additional_info,
 )
 
 
@@ -13,8 +15,18 @@ class CsvGenerator:
     def generate_csv(self):
         self.logger.info("Generating CSV file with test cases")
         path_to_tests = self.config.get_robot_tests_folder_path()
-        robot_tests = run_dryrun_and_get_tests_with_additional_info(
-            path_to_tests, "dry_run_output.xml"
+        parse_cache = None
+        if self.config.get_robot_parse_cache_enabled():
+            parse_cache = ParseCache(self.config.get_robot_parse_cache_path())
+        robot_tests = get_robot_tests_with_additional_info(
+            path_to_tests,
+            self.config.get_robot_inventory_mode(),
+            "dry_run_output.xml",
+            parse_cache,
+            self.config.get_robot_inventory_workers(),
+            self.config.get_robot_inventory_shard_strategy(),
+            "csv",
+            TagRules(self.config.get_tag_rules(), self.config.get_tr_id_pattern()),
         )
         self.create_csv_file_for_tests(robot_tests["tests"])
 
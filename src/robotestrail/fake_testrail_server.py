@@ -0,0 +1,424 @@
+import argparse
+import json
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+from robotestrail.logging_config import setup_logging
+
+
+class FakeTestRailState:
+    """
+    In-memory TestRail data used by the fake server.
+
+    Only the fields read or written by robotestrail are modelled.
+    """
+
+    def __init__(self, project_name="Project", suite_name="Master"):
+        self.lock = threading.Lock()
+        self._ids = Counter()
+        self.projects = {}
+        self.suites = {}
+        self.sections = {}
+        self.cases = {}
+        self.plans = {}
+        self.runs = {}
+        self.results = []
+        self.users = {1: {"id": 1, "name": "Robot", "email": "robot@example.com"}}
+        self.milestones = {}
+        project = self.add_project(project_name)
+        self.add_suite(project["id"], suite_name)
+        self.case_types = [
+            {"id": 1, "name": "Automated", "is_default": False},
+            {"id": 2, "name": "Functionality", "is_default": False},
+            {"id": 3, "name": "Other", "is_default": True},
+        ]
+        self.priorities = [
+            {"id": 1, "name": "Low", "short_name": "Low", "priority": 1},
+            {"id": 2, "name": "Medium", "short_name": "Medium", "priority": 2},
+            {"id": 3, "name": "High", "short_name": "High", "priority": 3},
+            {"id": 4, "name": "Critical", "short_name": "Critical", "priority": 4},
+        ]
+        self.statuses = [
+            {"id": 1, "name": "passed"},
+            {"id": 3, "name": "untested"},
+            {"id": 4, "name": "retest"},
+            {"id": 5, "name": "failed"},
+        ]
+        self.case_fields = [
+            {
+                "id": 1,
+                "system_name": "custom_automation_type",
+                "configs": [{"options": {"items": "0, None\n1, Robot Framework\n2, Manual"}}],
+            },
+        ]
+
+    def next_id(self, kind):
+        self._ids[kind] += 1
+        return self._ids[kind]
+
+    def add_project(self, name):
+        project = {"id": self.next_id("project"), "name": name, "suite_mode": 3}
+        self.projects[project["id"]] = project
+        return project
+
+    def add_suite(self, project_id, name):
+        suite = {"id": self.next_id("suite"), "name": name, "project_id": project_id}
+        self.suites[suite["id"]] = suite
+        return suite
+
+    def add_section(self, project_id, data):
+        parent_id = data.get("parent_id")
+        parent = self.sections.get(parent_id)
+        section = {
+            "id": self.next_id("section"),
+            "suite_id": data.get("suite_id"),
+            "name": data.get("name"),
+            "description": data.get("description"),
+            "parent_id": parent_id,
+            "depth": parent["depth"] + 1 if parent else 0,
+            "display_order": len(self.sections) + 1,
+        }
+        self.sections[section["id"]] = section
+        return section
+
+    def add_case(self, section_id, data):
+        section = self.sections[section_id]
+        case = {
+            "id": self.next_id("case"),
+            "section_id": section_id,
+            "suite_id": section["suite_id"],
+            "title": data.get("title"),
+            "type_id": data.get("type_id") or 3,
+            "priority_id": data.get("priority_id") or 2,
+            "milestone_id": data.get("milestone_id"),
+            "refs": data.get("refs"),
+            "estimate": data.get("estimate"),
+            "custom_steps": data.get("custom_steps"),
+            "custom_preconds": data.get("custom_preconds"),
+            "custom_automation_type": data.get("custom_automation_type"),
+            "updated_on": int(time.time()),
+        }
+        self.cases[case["id"]] = case
+        return case
+
+    def seed(self, suite_id, cases, sections=50, root_name="tests"):
+        """Creates a root section, `sections` child sections and `cases` cases."""
+        root = self.add_section(None, {"suite_id": suite_id, "name": root_name})
+        children = [
+            self.add_section(
+                None,
+                {"suite_id": suite_id, "name": f"suite_{i}", "parent_id": root["id"]},
+            )
+            for i in range(max(1, sections))
+        ]
+        for i in range(cases):
+            self.add_case(
+                children[i % len(children)]["id"], {"title": f"Test {i}"}
+            )
+
+
+class FakeTestRailHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def _send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, method):
+        server = self.server
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        if len(body) != length:
+            # the client went away in the middle of the body, e.g. a killed
+            # sync: do not create a record from a partial request
+            self.close_connection = True
+            self._send_json(400, {"error": "Incomplete request body"})
+            return
+
+        query = urlsplit(self.path).query
+        parts = query.split("&")
+        route = parts[0].split("/api/v2/", 1)[-1].strip("/").split("/")
+        endpoint = route[0]
+        arg = int(route[1]) if len(route) > 1 and route[1].isdigit() else None
+        params = {}
+        for part in parts[1:]:
+            key, _, value = part.partition("=")
+            params[key] = unquote(value)
+
+        server.request_counts[endpoint] += 1
+        retry_after = server.take_rate_limit_slot()
+        if retry_after is not None:
+            server.request_counts["429"] += 1
+            self._send_json(
+                429,
+                {"error": "API Rate Limit Exceeded"},
+                {"Retry-After": str(max(1, int(retry_after + 0.999)))},
+            )
+            return
+        if server.latency:
+            time.sleep(server.latency)
+
+        try:
+            data = json.loads(body) if body else {}
+        except ValueError:
+            self._send_json(400, {"error": "Invalid JSON"})
+            return
+
+        handler = getattr(self, f"api_{endpoint}", None)
+        is_write = endpoint.split("_")[0] in ("add", "update", "delete", "move")
+        if handler is None or (method == "POST") != is_write:
+            self._send_json(404, {"error": f"Unknown method '{endpoint}'"})
+            return
+        try:
+            with server.state.lock:
+                status, result = handler(arg, params, data)
+        except KeyError as e:
+            status, result = 400, {"error": f"Field or object not found: {e}"}
+        self._send_json(status, result)
+
+    def _paginate(self, key, items, params, endpoint, arg, extra=""):
+        limit = min(int(params.get("limit", self.server.page_size)), self.server.page_size)
+        offset = int(params.get("offset", 0))
+        page = items[offset : offset + limit]
+        next_link = None
+        if offset + limit < len(items):
+            next_link = f"/api/v2/{endpoint}/{arg}{extra}&limit={limit}&offset={offset + limit}"
+        return 200, {
+            "offset": offset,
+            "limit": limit,
+            "size": len(page),
+            "_links": {"next": next_link, "prev": None},
+            key: page,
+        }
+
+    # read endpoints
+    def api_get_projects(self, arg, params, data):
+        projects = list(self.server.state.projects.values())
+        return self._paginate("projects", projects, params, "get_projects", "")
+
+    def api_get_suites(self, arg, params, data):
+        return 200, [s for s in self.server.state.suites.values() if s["project_id"] == arg]
+
+    def api_get_sections(self, arg, params, data):
+        suite_id = int(params.get("suite_id", 0))
+        sections = [s for s in self.server.state.sections.values() if s["suite_id"] == suite_id]
+        return self._paginate("sections", sections, params, "get_sections", arg, f"&suite_id={suite_id}")
+
+    def api_get_cases(self, arg, params, data):
+        suite_id = int(params.get("suite_id", 0))
+        cases = [c for c in self.server.state.cases.values() if c["suite_id"] == suite_id]
+        return self._paginate("cases", cases, params, "get_cases", arg, f"&suite_id={suite_id}")
+
+    def api_get_plans(self, arg, params, data):
+        plans = [p for p in self.server.state.plans.values() if p["project_id"] == arg]
+        return self._paginate("plans", plans, params, "get_plans", arg)
+
+    def api_get_milestones(self, arg, params, data):
+        milestones = list(self.server.state.milestones.values())
+        return self._paginate("milestones", milestones, params, "get_milestones", arg)
+
+    def api_get_case_types(self, arg, params, data):
+        return 200, self.server.state.case_types
+
+    def api_get_case_fields(self, arg, params, data):
+        return 200, self.server.state.case_fields
+
+    def api_get_priorities(self, arg, params, data):
+        return 200, self.server.state.priorities
+
+    def api_get_statuses(self, arg, params, data):
+        return 200, self.server.state.statuses
+
+    def api_get_result_fields(self, arg, params, data):
+        return 200, []
+
+    def api_get_current_user(self, arg, params, data):
+        return 200, self.server.state.users[1]
+
+    def api_get_user_by_email(self, arg, params, data):
+        for user in self.server.state.users.values():
+            if user["email"] == params.get("email"):
+                return 200, user
+        return 400, {"error": "Field :email is not a valid email address."}
+
+    # write endpoints
+    def api_add_section(self, arg, params, data):
+        return 200, self.server.state.add_section(arg, data)
+
+    def api_update_section(self, arg, params, data):
+        section = self.server.state.sections[arg]
+        for key in ("name", "description"):
+            if key in data:
+                section[key] = data[key]
+        return 200, section
+
+    def api_delete_section(self, arg, params, data):
+        state = self.server.state
+        state.sections.pop(arg)
+        for case_id in [c["id"] for c in state.cases.values() if c["section_id"] == arg]:
+            state.cases.pop(case_id)
+        return 200, {}
+
+    def api_add_case(self, arg, params, data):
+        return 200, self.server.state.add_case(arg, data)
+
+    def api_update_case(self, arg, params, data):
+        case = self.server.state.cases[arg]
+        case.update(data)
+        case["updated_on"] = int(time.time())
+        return 200, case
+
+    def api_move_cases_to_section(self, arg, params, data):
+        state = self.server.state
+        section = state.sections[arg]
+        case_ids = data.get("case_ids") or []
+        if isinstance(case_ids, str):
+            case_ids = [int(c) for c in case_ids.split(",") if c]
+        for case_id in case_ids:
+            state.cases[int(case_id)]["section_id"] = section["id"]
+        return 200, {}
+
+    def api_add_plan(self, arg, params, data):
+        state = self.server.state
+        plan = {
+            "id": state.next_id("plan"),
+            "project_id": arg,
+            "name": data.get("name"),
+            "description": data.get("description"),
+            "milestone_id": data.get("milestone_id"),
+            "entries": [],
+        }
+        state.plans[plan["id"]] = plan
+        return 200, plan
+
+    def api_add_plan_entry(self, arg, params, data):
+        state = self.server.state
+        plan = state.plans[arg]
+        run = {
+            "id": state.next_id("run"),
+            "plan_id": arg,
+            "suite_id": data.get("suite_id"),
+            "name": data.get("name"),
+            "case_ids": data.get("case_ids"),
+        }
+        state.runs[run["id"]] = run
+        entry = {"id": f"entry-{run['id']}", "suite_id": run["suite_id"], "runs": [run]}
+        plan["entries"].append(entry)
+        return 200, entry
+
+    def api_add_results_for_cases(self, arg, params, data):
+        state = self.server.state
+        state.runs[arg]
+        results = []
+        for result in data.get("results", []):
+            result = dict(result, id=state.next_id("result"), test_id=result.get("case_id"))
+            results.append(result)
+        state.results.extend(results)
+        return 200, results
+
+
+class FakeTestRailServer(ThreadingHTTPServer):
+    """
+    Local stand-in for the TestRail API v2.
+
+    Args:
+        address (tuple): Host and port, port 0 picks a free port.
+        latency (float): Seconds added to every request.
+        page_size (int): Items per page of the paginated endpoints.
+        rate_limit (int): Requests per second before 429 responses, 0 disables it.
+        state (FakeTestRailState): Data to serve, a new empty state by default.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address=("127.0.0.1", 0), latency=0.0, page_size=250, rate_limit=0, state=None):
+        super().__init__(address, FakeTestRailHandler)
+        self.latency = latency
+        self.page_size = page_size
+        self.rate_limit = rate_limit
+        self.state = state or FakeTestRailState()
+        self.request_counts = Counter()
+        self._request_times = deque()
+        self._rate_lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def take_rate_limit_slot(self):
+        """Returns None if the request may proceed, otherwise the seconds to wait."""
+        if not self.rate_limit:
+            return None
+        with self._rate_lock:
+            now = time.monotonic()
+            while self._request_times and now - self._request_times[0] >= 1.0:
+                self._request_times.popleft()
+            if len(self._request_times) >= self.rate_limit:
+                return 1.0 - (now - self._request_times[0])
+            self._request_times.append(now)
+            return None
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Local fake TestRail server for offline load testing of robotestrail"
+    )
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--page_size", type=int, default=250, help="Items per page")
+    parser.add_argument("--rate_limit", type=int, default=0, help="Requests per second before 429, 0 disables it")
+    parser.add_argument("--project", default="Project", help="Name of the project")
+    parser.add_argument("--suite", default="Master", help="Name of the suite")
+    parser.add_argument("--cases", type=int, default=0, help="Number of existing cases to create")
+    parser.add_argument("--sections", type=int, default=50, help="Number of sections for the existing cases")
+    args = parser.parse_args()
+
+    logger = setup_logging()
+    state = FakeTestRailState(args.project, args.suite)
+    if args.cases:
+        state.seed(1, args.cases, args.sections)
+    server = FakeTestRailServer(
+        (args.host, args.port), args.latency, args.page_size, args.rate_limit, state
+    )
+    logger.info(f"Fake TestRail server listening on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        logger.info(f"Requests served: {dict(server.request_counts)}")
+
+
+if __name__ == "__main__":
+    main()
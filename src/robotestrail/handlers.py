@@ -3,43 +3,67 @@ from robotestrail.test_sync_manager import TestSyncManager
 from robotestrail.csv_generator import CsvGenerator
 
 
-def sync_robot_tests_to_testrail_by_ids(config_path):
-    config = ConfigManager(config_path)
-    test_syncer_by_id = TestSyncManager(config)
-    test_syncer_by_id.sync_tests_by_id()
+def _create_test_sync_manager(config):
+    if config.get_engine() == "async":
+        from robotestrail.async_test_sync_manager import AsyncTestSyncManager
 
+        return AsyncTestSyncManager(config)
+    return TestSyncManager(config)
 
-def set_results_by_testrail_ids(config_path):
-    config = ConfigManager(config_path)
-    test_syncer_by_id = TestSyncManager(config)
-    test_syncer_by_id.set_results_by_id()
 
+def sync_robot_tests_to_testrail_by_ids(config_path, options=None):
+    config = ConfigManager(config_path, options)
+    test_syncer_by_id = _create_test_sync_manager(config)
+    try:
+        test_syncer_by_id.sync_tests_by_id()
+    finally:
+        test_syncer_by_id.report_metrics()
+        test_syncer_by_id.close()
 
-def sync_robot_test_by_name(config_path):
-    config = ConfigManager(config_path)
-    test_syncer_by_name = TestSyncManager(config)
-    test_syncer_by_name.sync_robot_test_by_name()
+
+def set_results_by_testrail_ids(config_path, options=None):
+    config = ConfigManager(config_path, options)
+    test_syncer_by_id = _create_test_sync_manager(config)
+    try:
+        test_syncer_by_id.set_results_by_id()
+    finally:
+        test_syncer_by_id.report_metrics()
+        test_syncer_by_id.close()
+
+
+def sync_robot_test_by_name(config_path, options=None):
+    config = ConfigManager(config_path, options)
+    test_syncer_by_name = _create_test_sync_manager(config)
+    try:
+        test_syncer_by_name.sync_robot_test_by_name()
+    finally:
+        test_syncer_by_name.report_metrics()
+        test_syncer_by_name.close()
 
 
-def add_new_test_results_by_name(config_path):
-    config = ConfigManager(config_path)
+def add_new_test_results_by_name(config_path, options=None):
+    config = ConfigManager(config_path, options)
     test_syncer_by_name = TestSyncManager(config)
-    test_syncer_by_name.add_new_test_results_by_name()
+    try:
+        test_syncer_by_name.add_new_test_results_by_name()
+    finally:
+        test_syncer_by_name.report_metrics()
+        test_syncer_by_name.close()
 
 
-def generate_csv(config_path):
-    config = ConfigManager(config_path)
+def generate_csv(config_path, options=None):
+    config = ConfigManager(config_path, options)
     csv_generator = CsvGenerator(config)
     csv_generator.generate_csv()
 
 
-def show_info(config_path):
-    config = ConfigManager(config_path)
+def show_info(config_path, options=None):
+    config = ConfigManager(config_path, options)
     test_syncer = TestSyncManager(config)
     test_syncer.show_info()
 
 
-def check(config_path):
-    config = ConfigManager(config_path)
+def check(config_path, options=None):
+    config = ConfigManager(config_path, options)
     test_syncer = TestSyncManager(config)
     test_syncer.check()
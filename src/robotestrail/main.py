@@ -60,6 +60,37 @@ def main():
         action="store_true",
         help="Create a new config file with the default values",
     )
+    parser.add_argument(
+        "--engine",
+        "-e",
+        choices=["threads", "async"],
+        default=None,
+        help="Engine used for the sync and results requests: a thread pool (default) or an asyncio event loop (requires aiohttp)",
+    )
+    parser.add_argument(
+        "--refresh_cache",
+        "-rc",
+        action="store_true",
+        help="Ignore the cached TestRail metadata (projects, milestones, fields, etc) and download it again",
+    )
+    parser.add_argument(
+        "--full",
+        "-f",
+        action="store_true",
+        help="Ignore the local case state store (state.path), compare every test case with TestRail and rebuild the store",
+    )
+    parser.add_argument(
+        "--resume",
+        "-rs",
+        action="store_true",
+        help="Continue an interrupted sync or results upload: the TestRail writes recorded in the journal (journal.path) are not sent again",
+    )
+    parser.add_argument(
+        "--pipeline",
+        "-p",
+        action="store_true",
+        help="Sync by name as a pipeline: the test cases of a section are written as soon as the section exists, alongside the section updates",
+    )
     parser.add_argument(
         "--config_path",
         "-config",
@@ -80,20 +111,28 @@ def main():
         add_new_test_results_by_name,
     )
 
+    options = {
+        "engine": args.engine,
+        "refresh_cache": args.refresh_cache,
+        "full": args.full,
+        "resume": args.resume,
+        "pipeline": args.pipeline,
+    }
+
     if args.sync:
-        sync_robot_test_by_name(args.config_path)
+        sync_robot_test_by_name(args.config_path, options)
     elif args.results:
-        add_new_test_results_by_name(args.config_path)
+        add_new_test_results_by_name(args.config_path, options)
     elif args.info:
-        show_info(args.config_path)
+        show_info(args.config_path, options)
     elif args.csv:
-        generate_csv(args.config_path)
+        generate_csv(args.config_path, options)
     elif args.sync_by_id:
-        sync_robot_tests_to_testrail_by_ids(args.config_path)
+        sync_robot_tests_to_testrail_by_ids(args.config_path, options)
     elif args.results_by_id:
-        set_results_by_testrail_ids(args.config_path)
+        set_results_by_testrail_ids(args.config_path, options)
     elif args.check:
-        check(args.config_path)
+        check(args.config_path, options)
     # elif args.check:
     #    create_config()
     else:
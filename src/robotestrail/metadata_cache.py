@@ -0,0 +1,110 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+from robotestrail.logging_config import setup_logging
+
+
+class MetadataCache:
+    """
+    Persistent cache for TestRail metadata (projects, milestones, case types, ...).
+
+    Entries are stored in one JSON file, keyed by TestRail URL, user and
+    endpoint, and expire after `ttl` seconds. The file is replaced atomically,
+    so parallel CLI invocations never read a half-written cache.
+    """
+
+    def __init__(self, path, url, user, ttl=600, enabled=True, refresh=False):
+        self.logger = setup_logging()
+        self.path = os.path.expanduser(path)
+        self.url = url
+        self.user = user
+        self.ttl = ttl
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        if self.enabled and refresh:
+            self.invalidate()
+
+    def _key(self, endpoint):
+        return hashlib.sha256(f"{self.url}|{self.user}|{endpoint}".encode("utf-8")).hexdigest()
+
+    def _namespace_prefix(self):
+        return hashlib.sha256(f"{self.url}|{self.user}|".encode("utf-8")).hexdigest()
+
+    def _load(self):
+        try:
+            with open(self.path, "r", encoding="utf-8") as cache_file:
+                return json.load(cache_file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable metadata cache '{self.path}': {e}")
+            return {}
+
+    def _save(self, entries):
+        directory = os.path.dirname(self.path) or "."
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metadata-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as tmp_file:
+                json.dump(entries, tmp_file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            self.logger.warning(f"Unable to write metadata cache '{self.path}': {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+    def get(self, endpoint):
+        """
+        Returns the cached response of the endpoint, or None if it is missing or expired.
+        """
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._load().get(self._key(endpoint))
+        if not entry or time.time() - entry["stored_at"] > self.ttl:
+            return None
+        self.logger.debug(f"Metadata cache hit: {endpoint}")
+        return entry["value"]
+
+    def set(self, endpoint, value):
+        if not self.enabled:
+            return
+        with self._lock:
+            entries = self._load()
+            now = time.time()
+            # drop the expired entries of all instances while the file is rewritten
+            entries = {
+                key: entry
+                for key, entry in entries.items()
+                if now - entry.get("stored_at", 0) <= entry.get("ttl", self.ttl)
+            }
+            entries[self._key(endpoint)] = {
+                "namespace": self._namespace_prefix(),
+                "stored_at": now,
+                "ttl": self.ttl,
+                "value": value,
+            }
+            self._save(entries)
+
+    def invalidate(self, endpoint=None):
+        """
+        Removes the entry of the endpoint, or all entries of this TestRail URL and user.
+        """
+        with self._lock:
+            entries = self._load()
+            if endpoint is not None:
+                entries.pop(self._key(endpoint), None)
+            else:
+                namespace = self._namespace_prefix()
+                entries = {
+                    key: entry
+                    for key, entry in entries.items()
+                    if entry.get("namespace") != namespace
+                }
+            self._save(entries)
+        self.logger.info("Metadata cache invalidated")
@@ -0,0 +1,200 @@
+import asyncio
+import functools
+import json
+import os
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from robotestrail.logging_config import setup_logging
+
+
+def percentile(sorted_values, fraction):
+    """Returns the nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    index = max(0, min(len(sorted_values) - 1, int(round(fraction * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[index]
+
+
+def timed_phase(name):
+    """
+    Decorator that adds the run time of a method to the phase of self.metrics.
+
+    Works for plain methods and coroutines.
+    """
+    def decorator(func):
+        if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(self, *args, **kwargs):
+                with self.metrics.phase(name):
+                    return await func(self, *args, **kwargs)
+
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with self.metrics.phase(name):
+                return func(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+class _EndpointStats:
+    def __init__(self):
+        self.statuses = {}
+        self.latencies = []
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.retries = 0
+
+
+class Metrics:
+    """
+    Request and phase metrics of one robotestrail run.
+
+    Every TestRail request is recorded per endpoint (count per HTTP status,
+    latency, bytes sent/received, retries) and every TestSyncManager phase
+    gets its wall-clock time. The summary is logged at the end of the run and
+    can be written as JSON or as a Prometheus textfile.
+    """
+
+    def __init__(self, enabled=True):
+        self.logger = setup_logging()
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._phases = {}
+        self._started = time.monotonic()
+
+    def record_request(self, endpoint, status, seconds, bytes_sent=0, bytes_received=0):
+        if not self.enabled:
+            return
+        with self._lock:
+            stats = self._endpoints.setdefault(endpoint, _EndpointStats())
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.latencies.append(seconds)
+            stats.bytes_sent += bytes_sent
+            stats.bytes_received += bytes_received
+
+    def record_retry(self, endpoint):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._endpoints.setdefault(endpoint, _EndpointStats()).retries += 1
+
+    @contextmanager
+    def phase(self, name):
+        """Adds the wall-clock time of the block to the phase."""
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            if self.enabled:
+                with self._lock:
+                    self._phases[name] = self._phases.get(name, 0.0) + time.monotonic() - start
+
+    def to_dict(self):
+        with self._lock:
+            endpoints = {}
+            for endpoint, stats in sorted(self._endpoints.items()):
+                latencies = sorted(stats.latencies)
+                # the HTTP status codes are ints, a failed request is "error"
+                statuses = sorted((str(s), c) for s, c in stats.statuses.items())
+                endpoints[endpoint] = {
+                    "count": len(latencies),
+                    "statuses": dict(statuses),
+                    "p50": percentile(latencies, 0.50),
+                    "p95": percentile(latencies, 0.95),
+                    "p99": percentile(latencies, 0.99),
+                    "total_seconds": sum(latencies),
+                    "bytes_sent": stats.bytes_sent,
+                    "bytes_received": stats.bytes_received,
+                    "retries": stats.retries,
+                }
+            return {
+                "wall_seconds": time.monotonic() - self._started,
+                "phases": dict(self._phases),
+                "endpoints": endpoints,
+            }
+
+    def format_summary(self):
+        data = self.to_dict()
+        lines = [f"Run time: {data['wall_seconds']:.2f}s"]
+        if data["phases"]:
+            lines.append("Phases:")
+            for name, seconds in data["phases"].items():
+                lines.append(f"  {name:<20} {seconds:9.2f}s")
+        if data["endpoints"]:
+            lines.append(
+                f"  {'endpoint':<24}{'count':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+                f"{'sent KB':>10}{'recv KB':>10}{'retries':>9}  statuses"
+            )
+            for endpoint, s in data["endpoints"].items():
+                statuses = ", ".join(f"{k}: {v}" for k, v in s["statuses"].items())
+                lines.append(
+                    f"  {endpoint:<24}{s['count']:>7}{s['p50'] * 1000:>9.0f}{s['p95'] * 1000:>9.0f}"
+                    f"{s['p99'] * 1000:>9.0f}{s['bytes_sent'] / 1024:>10.1f}"
+                    f"{s['bytes_received'] / 1024:>10.1f}{s['retries']:>9}  {statuses}"
+                )
+        return "\n".join(lines)
+
+    def format_prometheus(self):
+        data = self.to_dict()
+        lines = [
+            "# TYPE robotestrail_requests_total counter",
+            "# TYPE robotestrail_request_duration_seconds summary",
+            "# TYPE robotestrail_request_bytes_sent_total counter",
+            "# TYPE robotestrail_request_bytes_received_total counter",
+            "# TYPE robotestrail_request_retries_total counter",
+            "# TYPE robotestrail_phase_duration_seconds gauge",
+        ]
+        for endpoint, s in data["endpoints"].items():
+            for status, count in s["statuses"].items():
+                lines.append(
+                    f'robotestrail_requests_total{{endpoint="{endpoint}",status="{status}"}} {count}'
+                )
+            for quantile in ("p50", "p95", "p99"):
+                lines.append(
+                    f'robotestrail_request_duration_seconds{{endpoint="{endpoint}",quantile="0.{quantile[1:]}"}} {s[quantile]}'
+                )
+            lines.append(f'robotestrail_request_duration_seconds_sum{{endpoint="{endpoint}"}} {s["total_seconds"]}')
+            lines.append(f'robotestrail_request_duration_seconds_count{{endpoint="{endpoint}"}} {s["count"]}')
+            lines.append(f'robotestrail_request_bytes_sent_total{{endpoint="{endpoint}"}} {s["bytes_sent"]}')
+            lines.append(f'robotestrail_request_bytes_received_total{{endpoint="{endpoint}"}} {s["bytes_received"]}')
+            lines.append(f'robotestrail_request_retries_total{{endpoint="{endpoint}"}} {s["retries"]}')
+        for name, seconds in data["phases"].items():
+            lines.append(f'robotestrail_phase_duration_seconds{{phase="{name}"}} {seconds}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, path, output_format="json"):
+        """
+        Writes the metrics to a file atomically.
+
+        Args:
+            path (str): The output file.
+            output_format (str): "json" or "prometheus" (node_exporter textfile).
+        """
+        if output_format == "prometheus":
+            content = self.format_prometheus()
+        else:
+            content = json.dumps(self.to_dict(), indent=2)
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+        self.logger.info(f"Metrics written to: {path}")
+
+    def report(self, path=None, output_format="json"):
+        """Logs the summary and writes the metrics file if a path is given."""
+        if not self.enabled:
+            return
+        self.logger.info("Metrics summary:\n%s", self.format_summary())
+        if path:
+            try:
+                self.write(path, output_format)
+            except OSError as e:
+                self.logger.error(f"Unable to write metrics to '{path}': {e}")
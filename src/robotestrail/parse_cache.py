@@ -0,0 +1,125 @@
+import gzip
+import hashlib
+import json
+import os
+import tempfile
+import robot
+from robotestrail.logging_config import setup_logging
+
+# Bump when the cached test records change
+CACHE_FORMAT_VERSION = 1
+
+
+def get_file_hash(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def get_tree_fingerprint(shared_files):
+    """
+    Returns a hash of the files that affect the records of every suite file.
+
+    The __init__ files give their Test Tags and documentation context to all
+    the suites below them, so any change to them (or to a resource file of
+    the tree) invalidates the whole cache of the tree, as does a new Robot
+    Framework version.
+    """
+    sha = hashlib.sha256(f"{CACHE_FORMAT_VERSION}|{robot.__version__}".encode("utf-8"))
+    for path in sorted(shared_files):
+        sha.update(f"|{path}|{get_file_hash(path)}".encode("utf-8"))
+    return sha.hexdigest()
+
+
+class ParseCache:
+    """
+    Gzipped JSON cache of the static test records of each suite file.
+
+    Entries are keyed by file path and validated by size and mtime, or by
+    the content hash when only the mtime changed (e.g. a fresh CI checkout).
+    Only the files that changed have to be parsed again.
+    """
+
+    def __init__(self, path):
+        self.logger = setup_logging()
+        self.path = os.path.expanduser(path)
+        self._data = None
+        self._files = {}
+        self._seen = set()
+        self._pending = {}
+        self._dirty = False
+
+    def _load_data(self):
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_FORMAT_VERSION:
+                return data
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable parse cache '{self.path}': {e}")
+        return {"version": CACHE_FORMAT_VERSION, "roots": {}}
+
+    def load(self, root, fingerprint):
+        """Selects the entries of the tests folder, dropping them if the fingerprint changed."""
+        self._data = self._load_data()
+        tree = self._data["roots"].get(root)
+        if tree is None or tree.get("fingerprint") != fingerprint:
+            if tree is not None:
+                self.logger.info("Parse cache invalidated: an __init__ or resource file changed")
+            tree = {"fingerprint": fingerprint, "files": {}}
+            self._data["roots"][root] = tree
+            self._dirty = True
+        self._files = tree["files"]
+        self._seen = set()
+        self._pending = {}
+
+    def get(self, source):
+        """Returns the cached test records of the suite file, or None if it changed."""
+        self._seen.add(source)
+        stat = os.stat(source)
+        entry = self._files.get(source)
+        if entry and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            return entry["tests"]
+        file_hash = get_file_hash(source)
+        if entry and entry["sha256"] == file_hash:
+            entry["size"], entry["mtime_ns"] = stat.st_size, stat.st_mtime_ns
+            self._dirty = True
+            return entry["tests"]
+        self._pending[source] = (stat.st_size, stat.st_mtime_ns, file_hash)
+        return None
+
+    def set(self, source, tests):
+        size, mtime_ns, file_hash = self._pending.pop(source)
+        self._files[source] = {
+            "size": size,
+            "mtime_ns": mtime_ns,
+            "sha256": file_hash,
+            "tests": tests,
+        }
+        self._dirty = True
+
+    def save(self):
+        # drop the files that were removed from the tree
+        for source in [s for s in self._files if s not in self._seen]:
+            del self._files[source]
+            self._dirty = True
+        if not self._dirty:
+            return
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".parse-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb") as f:
+                f.write(json.dumps(self._data, separators=(",", ":")).encode("utf-8"))
+            os.replace(tmp_path, self.path)
+            self._dirty = False
+        except OSError as e:
+            self.logger.warning(f"Unable to write parse cache '{self.path}': {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
@@ -0,0 +1,114 @@
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from robotestrail.logging_config import setup_logging
+
+
+# HTTP status codes TestRail uses to signal that the client has to slow down
+THROTTLE_STATUS_CODES = (429, 503)
+
+
+def parse_retry_after(value):
+    """
+    Parses the value of a Retry-After header.
+
+    Args:
+        value (str): Delay in seconds or an HTTP date.
+
+    Returns:
+        float or None: The delay in seconds, or None if the value is missing or invalid.
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RateGovernor:
+    """
+    Shared limit for the number of in-flight TestRail requests.
+
+    The limit follows AIMD: it grows by one request per window of successful
+    responses and is halved when TestRail throttles. A Retry-After from the
+    server pauses every worker, not only the one that received it.
+    """
+
+    def __init__(
+        self,
+        initial_limit,
+        min_limit=1,
+        max_limit=None,
+        adaptive=True,
+        max_retries=5,
+        backoff_base=1.0,
+        backoff_max=60.0,
+    ):
+        self.logger = setup_logging()
+        self.min_limit = max(1, min_limit)
+        self.max_limit = max(max_limit or initial_limit, initial_limit, self.min_limit)
+        self.adaptive = adaptive
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limit = float(max(initial_limit, self.min_limit))
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        with self._condition:
+            while True:
+                pause = self._paused_until - time.monotonic()
+                if pause > 0:
+                    self._condition.wait(pause)
+                elif self._in_flight < int(self.limit):
+                    break
+                else:
+                    self._condition.wait()
+            self._in_flight += 1
+
+    def release(self):
+        with self._condition:
+            self._in_flight -= 1
+            self._condition.notify_all()
+
+    def on_success(self):
+        if not self.adaptive:
+            return
+        with self._condition:
+            previous_limit = int(self.limit)
+            self.limit = min(self.max_limit, self.limit + 1 / self.limit)
+            if int(self.limit) > previous_limit:
+                self.logger.debug(f"Concurrency limit raised to {int(self.limit)}")
+                self._condition.notify_all()
+
+    def on_throttle(self, retry_after=None):
+        with self._condition:
+            now = time.monotonic()
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            # A burst of throttled responses for the same window counts as one
+            # congestion signal, otherwise the limit would collapse to the minimum
+            if self.adaptive and now - self._last_decrease > 1.0:
+                self.limit = max(self.min_limit, self.limit / 2)
+                self._last_decrease = now
+                self.logger.info(f"TestRail is throttling, concurrency limit lowered to {int(self.limit)}")
+
+    def retry_delay(self, attempt, retry_after=None):
+        """
+        Returns the delay before the next retry.
+
+        Retry-After from the server wins; otherwise an exponential backoff with
+        full jitter is used so the workers do not retry in lockstep.
+        """
+        if retry_after is not None:
+            return retry_after + random.uniform(0, self.backoff_base)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2**attempt))
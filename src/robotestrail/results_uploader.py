@@ -0,0 +1,186 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from robotestrail.logging_config import setup_logging
+
+
+def iter_result_chunks(results, max_count, max_bytes):
+    """
+    Groups the results into chunks for add_results_for_cases.
+
+    A chunk is closed when it holds max_count results or when adding the next
+    result would make its JSON payload bigger than max_bytes.
+
+    Yields:
+        list: The results of one chunk.
+    """
+    chunk = []
+    chunk_bytes = 0
+    for result in results:
+        result_bytes = len(json.dumps(result)) + 1
+        if chunk and (len(chunk) >= max_count or chunk_bytes + result_bytes > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(result)
+        chunk_bytes += result_bytes
+    if chunk:
+        yield chunk
+
+
+def get_chunk_key(chunk):
+    return hashlib.sha256(json.dumps(chunk, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def get_file_fingerprint(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+class ResultsUploader:
+    """
+    Uploads test results to a run in chunks, concurrently and resumably.
+
+    The checkpoint file records the run and the chunks that were accepted by
+    TestRail for one output.xml. When an upload fails, re-running the same
+    command with the same output.xml reuses the run and sends only the
+    missing chunks. The checkpoint is removed once every chunk is uploaded.
+
+    The checkpoint is only resumed by the same command (e.g. "results_by_id")
+    on the same TestRail URL and project: the runs of the results by name and
+    by ID are created differently.
+    """
+
+    def __init__(self, tr_api, config, command):
+        self.logger = setup_logging()
+        self.tr_api = tr_api
+        self.chunk_size = config.get_results_chunk_size()
+        self.chunk_max_bytes = config.get_results_chunk_max_bytes()
+        self.workers = config.get_results_upload_workers() or tr_api.governor.max_limit
+        self.checkpoint_file = config.get_results_checkpoint_file()
+        self.scope = {
+            "command": command,
+            "url": tr_api.base_url,
+            "project": config.get_project_name(),
+        }
+        self.fingerprint = None
+        self._done = set()
+        self._run_id = None
+        self._lock = threading.Lock()
+
+    def load_run_id(self, output_file):
+        """
+        Returns the run of an unfinished upload of the output file, or None.
+        """
+        self.fingerprint = get_file_fingerprint(output_file)
+        try:
+            with open(self.checkpoint_file, "r", encoding="utf-8") as f:
+                checkpoint = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            self.logger.warning(f"Ignoring unreadable results checkpoint '{self.checkpoint_file}': {e}")
+            return None
+
+        if checkpoint.get("fingerprint") != self.fingerprint:
+            return None
+        if checkpoint.get("scope") != self.scope:
+            self.logger.info(
+                f"The results checkpoint '{self.checkpoint_file}' is not resumed: it was written by another command, TestRail URL or project"
+            )
+            return None
+        self._run_id = checkpoint["run_id"]
+        self._done = set(checkpoint.get("done", []))
+        self.logger.info(
+            f"Resuming the results upload to run {self._run_id}: {len(self._done)} chunks were already uploaded"
+        )
+        return self._run_id
+
+    def start(self, run_id):
+        self._run_id = run_id
+        self._done = set()
+        self._save()
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.checkpoint_file))
+        fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".results-", suffix=".tmp")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "fingerprint": self.fingerprint,
+                    "scope": self.scope,
+                    "run_id": self._run_id,
+                    "done": sorted(self._done),
+                },
+                f,
+            )
+        os.replace(tmp_path, self.checkpoint_file)
+
+    def iter_pending_chunks(self, results):
+        """
+        Yields (key, chunk) for the chunks not uploaded yet.
+        """
+        for chunk in iter_result_chunks(results, self.chunk_size, self.chunk_max_bytes):
+            key = get_chunk_key(chunk)
+            if key in self._done:
+                continue
+            yield key, chunk
+
+    def mark_done(self, key):
+        with self._lock:
+            self._done.add(key)
+            self._save()
+
+    def finish(self, failed):
+        if failed:
+            raise Exception(
+                f"Failed to upload {failed} result chunks to run {self._run_id}. Run the same command again to upload only the missing chunks"
+            )
+        try:
+            os.remove(self.checkpoint_file)
+        except OSError:
+            pass
+        self.logger.info(f"All results uploaded to test run: {self._run_id}")
+
+    def upload(self, run_id, results):
+        """
+        Uploads the results to the run with a thread pool.
+
+        At most two chunks per worker are held in memory at once.
+
+        Args:
+            run_id (int): The TestRail run.
+            results (iterable): The results, e.g. a generator.
+        """
+        def upload_chunk(key, chunk):
+            self.tr_api.add_results_for_cases(run_id, {"results": chunk})
+            self.mark_done(key)
+            return len(chunk)
+
+        failed = 0
+        uploaded = 0
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for key, chunk in self.iter_pending_chunks(results):
+                if len(pending) >= self.workers * 2:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    failed, uploaded = self._collect(done, failed, uploaded)
+                pending.add(executor.submit(upload_chunk, key, chunk))
+            failed, uploaded = self._collect(pending, failed, uploaded)
+        self.logger.info(f"Uploaded {uploaded} results to test run: {run_id}")
+        self.finish(failed)
+
+    def _collect(self, futures, failed, uploaded):
+        for future in futures:
+            try:
+                uploaded += future.result()
+            except Exception as e:
+                failed += 1
+                self.logger.error(f"Error uploading a results chunk: {e}")
+        return failed, uploaded
@@ -1,21 +1,50 @@
+import glob
 import os
-import re
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from xml.etree.ElementTree import iterparse
 from robot import run
-from robot.api import ExecutionResult, ResultVisitor
+from robot.api import ExecutionResult, ResultVisitor, TestSuiteBuilder
+from robot.parsing.suitestructure import SuiteStructureBuilder
 from robotestrail.logging_config import setup_logging
+from robotestrail.parse_cache import get_tree_fingerprint
+from robotestrail.tag_rules import TagRules
+from robotestrail.robot_test_records import (
+    RobotTestInventory,
+    SuiteInfo,
+    TestRecord,
+    TestStep,
+    intern_string,
+)
 
 # Initialize the logger for this module
 logger = setup_logging()
 
+# Optional fields of the test records computed by each extraction profile.
+# The other fields (title, tags, path, suite, status, tr_ids, ...) are always set.
+EXTRACTION_PROFILES = {
+    "sync": {"steps", "rich_text_steps", "formatted_tags"},
+    "csv": {"steps", "rich_text_steps"},
+    "results": set(),
+}
+
+
+def get_extraction_fields(profile):
+    if profile not in EXTRACTION_PROFILES:
+        raise ValueError(f"Unknown extraction profile: '{profile}'")
+    return EXTRACTION_PROFILES[profile]
+
 
 class TestSuiteVisitor(ResultVisitor):
-    def __init__(self):
+    def __init__(self, profile="sync"):
         self.test_cases = []
+        self.fields = get_extraction_fields(profile)
 
     def visit_suite(self, suite):
-        self.current_suite_doc = suite.doc
-        self.current_suite_id = suite.id
-        self.current_suite_source = str(suite.source) if suite.source else None
+        self.current_suite = SuiteInfo(
+            suite.id, str(suite.source) if suite.source else None, suite.doc
+        )
         self.current_suite_starttime = suite.starttime
         self.current_suite_endtime = suite.endtime
         self.current_suite_status = suite.status
@@ -26,19 +55,17 @@ class TestSuiteVisitor(ResultVisitor):
             self.visit_suite(child_suite)
 
     def visit_test(self, test):
-        test_info = {
-            "title": test.name,
-            "tags": [str(tag) for tag in test.tags],
-            "steps": self._parse_keywords(test.body),
-            "formatted_path": self._get_test_path(test).lower(),
-            "suite_documentation": self.current_suite_doc,
-            "suite_id": self.current_suite_id,
-            "suite_source": self.current_suite_source,
-            "test_status": test.status,
-            "test_documentation": test.doc,
-            "status_message": test.message,
-            "elapsedtime": test.elapsedtime,
-        }
+        test_info = TestRecord(
+            test.name,
+            test.tags,
+            self._parse_keywords(test.body) if "steps" in self.fields else [],
+            self._get_test_path(test).lower(),
+            self.current_suite,
+            test.status,
+            test.doc,
+            test.message,
+            test.elapsedtime,
+        )
         self.test_cases.append(test_info)
 
     def _parse_keywords(self, keywords):
@@ -46,14 +73,14 @@ class TestSuiteVisitor(ResultVisitor):
         for kw in keywords:
             if kw.type == "KEYWORD":
                 steps.append(
-                    {
-                        "step_name": kw.name.split(".", 1)[-1],
-                        "args": [str(arg) for arg in kw.args],
-                        "library": kw.libname,
-                        "status": kw.status,
-                        "starttime": kw.starttime,
-                        "endtime": kw.endtime,
-                    }
+                    TestStep(
+                        kw.name.split(".", 1)[-1],
+                        [str(arg) for arg in kw.args],
+                        kw.libname,
+                        kw.status,
+                        kw.starttime,
+                        kw.endtime,
+                    )
                 )
         return steps
 
@@ -68,9 +95,55 @@ class TestSuiteVisitor(ResultVisitor):
         return " > ".join(path_elements)
 
 
-def parse_robot_output_xml(output_file):
+class TestSuiteModelVisitor(TestSuiteVisitor):
+    """
+    Builds the same test records from the suite model of TestSuiteBuilder.
+
+    The model is parsed from the files only: no library is imported and no
+    output.xml is written. The execution fields (status, times, library of a
+    keyword) are None.
+    """
+
+    def visit_suite(self, suite):
+        self.current_suite = SuiteInfo(
+            suite.id, str(suite.source) if suite.source else None, suite.doc
+        )
+        self.current_suite_starttime = None
+        self.current_suite_endtime = None
+        self.current_suite_status = None
+
+        for test in suite.tests:
+            self.visit_test(test)
+        for child_suite in suite.suites:
+            self.visit_suite(child_suite)
+
+    def visit_test(self, test):
+        test_info = TestRecord(
+            test.name,
+            test.tags,
+            self._parse_keywords(test.body) if "steps" in self.fields else [],
+            self._get_test_path(test).lower(),
+            self.current_suite,
+            None,
+            test.doc,
+            "",
+            None,
+        )
+        self.test_cases.append(test_info)
+
+    def _parse_keywords(self, keywords):
+        steps = []
+        for kw in keywords:
+            if kw.type == "KEYWORD":
+                steps.append(
+                    TestStep(kw.name.split(".", 1)[-1], [str(arg) for arg in kw.args])
+                )
+        return steps
+
+
+def parse_robot_output_xml(output_file, profile="sync"):
     result = ExecutionResult(output_file)
-    visitor = TestSuiteVisitor()
+    visitor = TestSuiteVisitor(profile)
     result.visit(visitor)
 
     # write to json
@@ -80,7 +153,81 @@ def parse_robot_output_xml(output_file):
     return visitor.test_cases
 
 
-def run_robot_dryrun(output_file, path_to_tests):
+def _get_elapsed_milliseconds(status):
+    """Returns the elapsed time of a status element of output.xml in milliseconds."""
+    # Robot Framework 7 writes the elapsed seconds, older versions the times
+    if "elapsed" in status.attrib:
+        return round(float(status.get("elapsed")) * 1000)
+    try:
+        start = datetime.strptime(status.get("starttime"), "%Y%m%d %H:%M:%S.%f")
+        end = datetime.strptime(status.get("endtime"), "%Y%m%d %H:%M:%S.%f")
+    except (TypeError, ValueError):
+        return 0
+    return round((end - start).total_seconds() * 1000)
+
+
+def iter_robot_output_xml(output_file):
+    """
+    Yields the test records of an output.xml one at a time.
+
+    The file is read incrementally and every element is dropped once it is
+    read, so the memory use does not depend on the file size. Only the
+    fields used to report results are read: the keywords, messages and
+    documentation are skipped.
+
+    Yields:
+        TestRecord: title, tags, formatted_path, suite_id, suite_source,
+            test_status, status_message and elapsedtime of a test.
+    """
+    # The suite of each open suite element and its name in formatted_path
+    suites = []
+    elements = []
+    test = None
+    tags = []
+    for event, element in iterparse(output_file, events=("start", "end")):
+        if event == "start":
+            elements.append(element)
+            if element.tag == "suite":
+                source = element.get("source")
+                suites.append(
+                    (
+                        SuiteInfo(element.get("id"), source, None),
+                        os.path.basename(source).replace(".robot", "") if source else None,
+                    )
+                )
+            elif element.tag == "test" and suites:
+                tags = []
+                test = TestRecord(
+                    element.get("name"),
+                    [],
+                    [],
+                    " > ".join(name for _, name in suites if name).lower(),
+                    suites[-1][0],
+                    elapsedtime=0,
+                )
+            continue
+
+        elements.pop()
+        parent = elements[-1] if elements else None
+        if test is not None and parent is not None and parent.tag == "test":
+            if element.tag == "tag":
+                tags.append(element.text or "")
+            elif element.tag == "status":
+                test.test_status = element.get("status")
+                test.status_message = element.text or ""
+                test.elapsedtime = _get_elapsed_milliseconds(element)
+        elif element.tag == "test" and test is not None:
+            test.tags = tuple(intern_string(tag) for tag in tags)
+            yield test
+            test = None
+        elif element.tag == "suite":
+            suites.pop()
+        element.clear()
+        if parent is not None:
+            parent.remove(element)
+
+
+def run_robot_dryrun(output_file, path_to_tests, **options):
     run(
         path_to_tests,
         dryrun=True,
@@ -89,13 +236,14 @@ def run_robot_dryrun(output_file, path_to_tests):
         report=None,
         stdout=None,
         stderr=None,
+        **options,
     )
 
 
-def run_dryrun_and_get_tests(path_to_tests, output_file):
-    run_robot_dryrun(output_file, path_to_tests)
+def run_dryrun_and_get_tests(path_to_tests, output_file, profile="sync", **options):
+    run_robot_dryrun(output_file, path_to_tests, **options)
 
-    test_cases = parse_robot_output_xml(output_file)
+    test_cases = parse_robot_output_xml(output_file, profile)
 
     try:
         os.remove(output_file)
@@ -105,122 +253,347 @@ def run_dryrun_and_get_tests(path_to_tests, output_file):
     return test_cases
 
 
-def add_additional_info_to_parsed_robot_tests(robot_tests):
+def parse_robot_tests_statically(
+    path_to_tests, parse_cache=None, workers=1, shard_strategy="suite", profile="sync"
+):
+    """
+    Returns the tests of the suite without running a dry-run.
+
+    Unlike the dry-run, the keywords are not validated, so a test that uses a
+    missing keyword or library is still listed.
+
+    Args:
+        path_to_tests (str): The tests folder.
+        parse_cache (ParseCache): Reuse the records of the unchanged files.
+        workers (int): Processes that parse the files, see get_inventory_shards.
+        shard_strategy (str): "suite" or "files", see get_inventory_shards.
+        profile (str): The extraction profile, see EXTRACTION_PROFILES. The
+            cached records are always complete, so they serve every profile.
+    """
+    if parse_cache is not None:
+        return _parse_robot_tests_with_cache(
+            path_to_tests, parse_cache, workers, shard_strategy
+        )
+    if workers != 1:
+        return get_robot_tests_in_parallel(
+            path_to_tests, "static", None, workers, shard_strategy, profile
+        )
+    suite = TestSuiteBuilder().build(path_to_tests)
+    visitor = TestSuiteModelVisitor(profile)
+    visitor.visit_suite(suite)
+    return visitor.test_cases
+
+
+def _parse_suite_files(path_to_tests, suite_files, profile="sync"):
+    """Returns the static records of some suite files of the tree."""
+    suite = TestSuiteBuilder(
+        included_files=[glob.escape(source) for source in suite_files],
+        allow_empty_suite=True,
+    ).build(path_to_tests)
+    visitor = TestSuiteModelVisitor(profile)
+    visitor.visit_suite(suite)
+    return visitor.test_cases
+
+
+def _dryrun_suite_files(path_to_tests, suite_files, output_file, profile="sync"):
+    """Returns the dry-run records of some suite files of the tree."""
+    return run_dryrun_and_get_tests(
+        path_to_tests,
+        output_file,
+        profile,
+        parseinclude=[glob.escape(source) for source in suite_files],
+        runemptysuite=True,
+        console="quiet",
+    )
+
+
+def _get_suite_structure(path_to_tests):
+    root = Path(os.path.normpath(path_to_tests)).absolute()
+    return root, SuiteStructureBuilder(TestSuiteBuilder().included_extensions).build(root)
+
+
+def _group_tests_by_file(tests):
+    tests_by_file = {}
+    for test in tests:
+        tests_by_file.setdefault(test["suite_source"], []).append(test)
+    return tests_by_file
+
+
+def get_inventory_shards(structure, shard_strategy, workers):
+    """
+    Splits the suite files of the tree into shards that are parsed in parallel.
+
+    Args:
+        structure (SuiteStructure): The suite structure of the tests folder.
+        shard_strategy (str): "suite" makes a shard of each top-level suite
+            (a directory or a file of the tests folder), "files" makes one
+            shard per worker with the same number of files.
+        workers (int): The number of processes.
+
+    Returns:
+        list: The shards, lists of suite files in suite order.
+    """
+    if shard_strategy == "suite":
+        shards = []
+        for child in structure.children if structure.children is not None else [structure]:
+            suite_files = []
+            _get_suite_files(child, suite_files, [])
+            if suite_files:
+                shards.append(suite_files)
+        return shards
+    if shard_strategy == "files":
+        suite_files = []
+        _get_suite_files(structure, suite_files, [])
+        size = max(1, -(-len(suite_files) // workers))
+        return [suite_files[i : i + size] for i in range(0, len(suite_files), size)]
+    raise ValueError(f"Unknown robot inventory shard strategy: '{shard_strategy}'")
+
+
+def _run_inventory_shards(root, shards, inventory_mode, output_file, workers, profile="sync"):
+    """Parses the shards in a process pool and returns the records by suite file."""
+    if output_file:
+        base, extension = os.path.splitext(output_file)
+    logger.info(
+        f"Inventory: {len(shards)} shards on {min(workers, len(shards))} processes"
+    )
+    with ProcessPoolExecutor(max_workers=min(workers, len(shards))) as executor:
+        futures = []
+        for i, shard in enumerate(shards, start=1):
+            if inventory_mode == "static":
+                futures.append(
+                    executor.submit(_parse_suite_files, str(root), shard, profile)
+                )
+            else:
+                futures.append(
+                    executor.submit(
+                        _dryrun_suite_files,
+                        str(root),
+                        shard,
+                        f"{base}_shard{i}{extension}",
+                        profile,
+                    )
+                )
+        tests = []
+        for future in futures:
+            tests.extend(future.result())
+    return _group_tests_by_file(tests)
+
+
+def get_robot_tests_in_parallel(
+    path_to_tests,
+    inventory_mode,
+    output_file,
+    workers=None,
+    shard_strategy="suite",
+    profile="sync",
+):
+    """
+    Returns the tests of the suite, parsed by shards in several processes.
+
+    Every shard parses the whole tree but only includes its own suite files,
+    so the __init__ settings and the formatted_path are the same as in a
+    single run. The records are merged in suite order and their suite IDs
+    are set as in a single run.
+
+    Args:
+        workers (int): The number of processes, all the cores if None or 0.
+    """
+    workers = workers or os.cpu_count() or 1
+    root, structure = _get_suite_structure(path_to_tests)
+    shards = get_inventory_shards(structure, shard_strategy, workers)
+    if workers == 1 or len(shards) <= 1:
+        if inventory_mode == "static":
+            return parse_robot_tests_statically(path_to_tests, profile=profile)
+        return run_dryrun_and_get_tests(path_to_tests, output_file, profile)
+    tests_by_file = _run_inventory_shards(
+        root, shards, inventory_mode, output_file, workers, profile
+    )
+    tests = []
+    _assign_suite_ids(structure, "s1", tests_by_file, tests)
+    return tests
+
+
+def _get_suite_files(structure, suite_files, init_files):
+    if structure.children is None:
+        suite_files.append(str(structure.source))
+        return
+    if structure.init_file:
+        init_files.append(str(structure.init_file))
+    for child in structure.children:
+        _get_suite_files(child, suite_files, init_files)
+
+
+def _get_resource_files(root):
+    if not os.path.isdir(root):
+        return []
+    return [
+        os.path.join(directory, name)
+        for directory, _, names in os.walk(root)
+        for name in names
+        if name.lower().endswith(".resource")
+    ]
+
+
+def _assign_suite_ids(structure, suite_id, tests_by_file, tests):
+    """
+    Appends the tests in suite order and sets their suite IDs.
+
+    Robot Framework removes the suites without tests, so they do not take an
+    index among their siblings. Returns True if the suite has tests.
+    """
+    if structure.children is None:
+        file_tests = tests_by_file.get(str(structure.source), [])
+        if file_tests:
+            suite = file_tests[0].suite
+            suite = SuiteInfo(suite_id, suite.source, suite.documentation)
+            for test in file_tests:
+                test.suite = suite
+            tests.extend(file_tests)
+        return bool(file_tests)
+    index = 0
+    for child in structure.children:
+        if _assign_suite_ids(child, f"{suite_id}-s{index + 1}", tests_by_file, tests):
+            index += 1
+    return index > 0
+
+
+def _parse_robot_tests_with_cache(path_to_tests, parse_cache, workers=1, shard_strategy="suite"):
+    root, structure = _get_suite_structure(path_to_tests)
+    suite_files, init_files = [], []
+    _get_suite_files(structure, suite_files, init_files)
+    parse_cache.load(
+        str(root), get_tree_fingerprint(init_files + _get_resource_files(str(root)))
+    )
+
+    tests_by_file = {}
+    changed_files = []
+    for source in suite_files:
+        cached_tests = parse_cache.get(source)
+        if cached_tests is None:
+            changed_files.append(source)
+        elif cached_tests:
+            first = cached_tests[0]
+            suite = SuiteInfo(
+                first["suite_id"], first["suite_source"], first["suite_documentation"]
+            )
+            tests_by_file[source] = [
+                TestRecord.from_dict(test, suite) for test in cached_tests
+            ]
+    logger.info(
+        f"Parse cache: {len(suite_files) - len(changed_files)} unchanged files, {len(changed_files)} files to parse"
+    )
+
+    if changed_files:
+        workers = workers or os.cpu_count() or 1
+        changed = set(changed_files)
+        shards = [
+            [source for source in shard if source in changed]
+            for shard in get_inventory_shards(structure, shard_strategy, workers)
+        ]
+        shards = [shard for shard in shards if shard]
+        if workers > 1 and len(shards) > 1:
+            parsed_tests = _run_inventory_shards(root, shards, "static", None, workers)
+        elif len(changed_files) == len(suite_files):
+            parsed_tests = _group_tests_by_file(parse_robot_tests_statically(root))
+        else:
+            # The __init__ files are still parsed, so the changed files get
+            # the same tags as in a full build
+            parsed_tests = _group_tests_by_file(_parse_suite_files(root, changed_files))
+        for source in changed_files:
+            tests_by_file[source] = parsed_tests.get(source, [])
+            parse_cache.set(source, [test.to_dict() for test in tests_by_file[source]])
+    parse_cache.save()
+
+    tests = []
+    _assign_suite_ids(structure, "s1", tests_by_file, tests)
+    return tests
+
+
+def add_additional_info_to_parsed_robot_tests(robot_tests, profile="sync", tag_rules=None):
+    fields = get_extraction_fields(profile)
+    tag_rules = tag_rules or TagRules()
+
     # add unique ID for each test case
     for i, test in enumerate(robot_tests):
         test["id"] = i
 
     # add rich text steps for each test case
-    for test in robot_tests:
-        test["rich_text_steps"] = get_rich_text_steps(test["steps"])
+    if "rich_text_steps" in fields:
+        for test in robot_tests:
+            test["rich_text_steps"] = get_rich_text_steps(test["steps"])
 
     # add formatted tags for each test case
-    for test in robot_tests:
-        test["formatted_tags"] = f'**[Tags]**\n{", ".join(test["tags"])}'
-
-    # set estimate, priority_id, type_id, milestone_id, refs for each test case
-    for test in robot_tests:
-        refs = []
-        defects = []
-        estimate = None
-        for tag in test["tags"]:
-            try:
-                tag = str(tag)
-                if tag.startswith("priority_id:"):
-                    test["priority_id"] = int(tag.split(":")[1])
-                elif tag.startswith("priority:"):
-                    test["priority"] = tag.split(":")[1]
-                elif tag.startswith("type_id:"):
-                    test["type_id"] = int(tag.split(":")[1])
-                elif tag.startswith("type:"):
-                    test["type"] = tag.split(":")[1]
-                elif tag.startswith("estimate:"):
-                    estimate = tag.split(":")[1]
-                elif tag.startswith("automation_type_id:"):
-                    test["custom_automation_type"] = int(tag.split(":")[1])
-                elif tag.startswith("automation_type:"):
-                    test["custom_automation_type"] = tag.split(":")[1]
-                elif tag.startswith("automatedby_id:"):
-                    test["custom_automatedby_id"] = int(tag.split(":")[1])
-                elif tag.startswith("customer:"):
-                    test["custom_customer"] = int(tag.split(":")[1])
-                elif tag.startswith("milestone:"):
-                    test["milestone"] = tag.split(":")[1]
-                elif tag.startswith("milestone_id:"):
-                    test["milestone_id"] = int(tag.split(":")[1])
-                elif tag.startswith("refs:"):
-                    refs.append(tag.split(":")[1])
-                elif tag.startswith("jira:"):
-                    refs.append(tag.split(":")[1])
-                    defects.append(tag.split(":")[1])
-                elif tag.startswith("defect:"):
-                    defects.append(tag.split(":")[1])
-                elif tag.startswith("bug:"):
-                    defects.append(tag.split(":")[1])
-            except Exception as e:
-                logger.error(f"Unable to parse tag: '{tag}' ] Error: {e}")
-
-        test["refs"] = ", ".join(refs) if refs else None
-        test["defects"] = ", ".join(defects) if defects else None
-        test["estimate"] = estimate
-
-    # add tr_id to each test case with tag in format C123456
-    for test in robot_tests:
-        tr_ids = []
-        for tag in test["tags"]:
-            if re.match(r"C\d{2,9}", tag):
-                tr_ids.append(tag)
-        test["tr_ids"] = tr_ids
-
-    tests_with_multiple_tr_ids = []
-    tests_with_one_tr_id = []
-    tests_with_no_tr_id = []
+    if "formatted_tags" in fields:
+        for test in robot_tests:
+            test["formatted_tags"] = f'**[Tags]**\n{", ".join(test["tags"])}'
 
+    # set estimate, priority_id, type_id, milestone_id, refs, tr_ids, ... for each test case
     for test in robot_tests:
-        if "tr_ids" not in test:
-            tests_with_no_tr_id.append(test)
+        tag_rules.apply(test)
 
-        if "tr_ids" in test:
-            if len(test["tr_ids"]) == 1:
-                tests_with_one_tr_id.append(test)
-            elif len(test["tr_ids"]) > 1:
-                tests_with_multiple_tr_ids.append(test)
+    # the classification by TestRail IDs is kept as arrays of test indexes
+    return RobotTestInventory(robot_tests)
 
-    # add information about duplicate TR ids
-    all_tr_ids = []
-    for test in robot_tests:
-        if test["tr_ids"]:
-            for tr_id in test["tr_ids"]:
-                all_tr_ids.append(tr_id)
 
-    test_ids_of_tests_with_multiple_tr_ids = [
-        t["id"] for t in tests_with_multiple_tr_ids
-    ]
-    all_robot_test_ids = [t["id"] for t in robot_tests]
+def iter_robot_test_results(output_file, tag_rules=None):
+    """Yields the test records of an output.xml with the fields read from their tags."""
+    tag_rules = tag_rules or TagRules()
+    for test in iter_robot_output_xml(output_file):
+        tag_rules.apply(test)
+        yield test
 
-    test_ids_of_tests_with_tr_ids = [t["id"] for t in robot_tests if "tr_id" in t]
 
-    test_ids_of_tests_without_tr_ids = list(
-        set(all_robot_test_ids) - set(test_ids_of_tests_with_tr_ids)
+def run_dryrun_and_get_tests_with_additional_info(
+    path_to_tests, output_file, profile="sync", tag_rules=None
+):
+    robot_tests = run_dryrun_and_get_tests(path_to_tests, output_file, profile)
+    tests_with_additional_info = add_additional_info_to_parsed_robot_tests(
+        robot_tests, profile, tag_rules
     )
-    tests_without_tr_id = [t for t in robot_tests if not t["tr_ids"]]
-
-    tests_with_additional_info = {
-        "tests": robot_tests,
-        "multiple_tr_ids": test_ids_of_tests_with_multiple_tr_ids,
-        "no_tr_id": test_ids_of_tests_without_tr_ids,
-        "tests_with_multiple_tr_ids": tests_with_multiple_tr_ids,
-        "tests_without_tr_id": tests_without_tr_id,
-        "tests_with_one_tr_id": tests_with_one_tr_id,
-        "all_tr_ids": all_tr_ids,
-    }
     return tests_with_additional_info
 
 
-def run_dryrun_and_get_tests_with_additional_info(path_to_tests, output_file):
-    robot_tests = run_dryrun_and_get_tests(path_to_tests, output_file)
-    tests_with_additional_info = add_additional_info_to_parsed_robot_tests(robot_tests)
-    return tests_with_additional_info
+def get_robot_tests_with_additional_info(
+    path_to_tests,
+    inventory_mode="dryrun",
+    output_file="dry_run_output.xml",
+    parse_cache=None,
+    workers=1,
+    shard_strategy="suite",
+    profile="sync",
+    tag_rules=None,
+):
+    """
+    Returns the tests of the suite with additional info.
+
+    Args:
+        path_to_tests (str): The tests folder.
+        inventory_mode (str): "dryrun" runs a Robot dry-run and parses its
+            output.xml, "static" parses the suite files only.
+        output_file (str): The output.xml of the dry-run.
+        parse_cache (ParseCache): Cache of the static records, static mode only.
+        workers (int): Processes of the inventory, all the cores if None or 0.
+        shard_strategy (str): How the tree is split between the processes,
+            see get_inventory_shards.
+        profile (str): The fields to compute, "sync" (all of them), "csv"
+            or "results", see EXTRACTION_PROFILES.
+        tag_rules (TagRules): The tag grammar, the built-in one if None.
+    """
+    if inventory_mode == "static":
+        robot_tests = parse_robot_tests_statically(
+            path_to_tests, parse_cache, workers, shard_strategy, profile
+        )
+        return add_additional_info_to_parsed_robot_tests(robot_tests, profile, tag_rules)
+    if inventory_mode != "dryrun":
+        raise ValueError(f"Unknown robot inventory mode: '{inventory_mode}'")
+    if workers != 1:
+        robot_tests = get_robot_tests_in_parallel(
+            path_to_tests, inventory_mode, output_file, workers, shard_strategy, profile
+        )
+        return add_additional_info_to_parsed_robot_tests(robot_tests, profile, tag_rules)
+    return run_dryrun_and_get_tests_with_additional_info(
+        path_to_tests, output_file, profile, tag_rules
+    )
 
 
 def get_rich_text_steps(steps):
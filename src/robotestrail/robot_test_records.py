@@ -0,0 +1,281 @@
+import sys
+from array import array
+from collections import namedtuple
+
+
+def intern_string(value):
+    """Returns the interned string, so equal tags or keyword names share one object."""
+    return sys.intern(str(value)) if value is not None else None
+
+
+class _Record:
+    """
+    Slotted record with read/write access by key, like the former dicts.
+
+    Only the names in FIELDS are keys. A field that was never set is a
+    missing key: record["priority_id"] raises KeyError, "priority_id" in
+    record is False and record.get("priority_id") returns the default.
+    """
+
+    __slots__ = ()
+    FIELDS = ()
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        try:
+            return getattr(self, key)
+        except AttributeError:
+            raise KeyError(key) from None
+
+    def __setitem__(self, key, value):
+        if key not in self.FIELDS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __contains__(self, key):
+        return key in self.FIELDS and hasattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def keys(self):
+        return [key for key in self.FIELDS if hasattr(self, key)]
+
+    def to_dict(self):
+        return {key: self[key] for key in self.keys()}
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+class SuiteInfo:
+    """The suite of a test, shared by all the tests of the suite."""
+
+    __slots__ = ("id", "source", "documentation")
+
+    def __init__(self, id, source, documentation):
+        self.id = id
+        self.source = source
+        self.documentation = documentation
+
+
+class TestStep(
+    namedtuple(
+        "TestStep", ("step_name", "args", "library", "status", "starttime", "endtime")
+    )
+):
+    """
+    A keyword of a test, readable by key like the former dicts.
+
+    A tuple of strings, so the garbage collector stops tracking it.
+    """
+
+    __slots__ = ()
+
+    def __new__(cls, step_name, args, library=None, status=None, starttime=None, endtime=None):
+        return super().__new__(
+            cls,
+            intern_string(step_name),
+            tuple(intern_string(arg) for arg in args),
+            intern_string(library),
+            intern_string(status),
+            starttime,
+            endtime,
+        )
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            if key not in self._fields:
+                raise KeyError(key)
+            return getattr(self, key)
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        return getattr(self, key) if key in self._fields else default
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in self._fields}
+
+
+class TestRecord(_Record):
+    """
+    A Robot Framework test of the inventory or of an output.xml.
+
+    The suite fields (suite_id, suite_source, suite_documentation) are read
+    from the shared SuiteInfo. The fields derived from the tags (priority_id,
+    refs, tr_ids, ...) and the extraction profile fields are set later, see
+    add_additional_info_to_parsed_robot_tests.
+
+    The tags, steps and tr_ids are tuples of interned strings, which the
+    garbage collector does not have to track.
+
+    The custom_* fields set by the tag rules of the config are kept in the
+    custom_fields dict, and can also be read and set by key.
+    """
+
+    # The base fields set by the parsers, in the order of the cached records
+    BASE_FIELDS = (
+        "title",
+        "tags",
+        "steps",
+        "formatted_path",
+        "suite_documentation",
+        "suite_id",
+        "suite_source",
+        "test_status",
+        "test_documentation",
+        "status_message",
+        "elapsedtime",
+    )
+    __slots__ = (
+        "title",
+        "tags",
+        "steps",
+        "formatted_path",
+        "suite",
+        "test_status",
+        "test_documentation",
+        "status_message",
+        "elapsedtime",
+        "id",
+        "rich_text_steps",
+        "formatted_tags",
+        "tr_ids",
+        "refs",
+        "defects",
+        "estimate",
+        "priority_id",
+        "priority",
+        "type_id",
+        "type",
+        "custom_automation_type",
+        "custom_automatedby_id",
+        "custom_customer",
+        "milestone",
+        "milestone_id",
+        "custom_fields",
+    )
+    FIELDS = BASE_FIELDS + __slots__[9:]
+
+    def __init__(
+        self,
+        title,
+        tags,
+        steps,
+        formatted_path,
+        suite,
+        test_status=None,
+        test_documentation=None,
+        status_message="",
+        elapsedtime=None,
+    ):
+        self.title = title
+        self.tags = tuple(intern_string(tag) for tag in tags)
+        self.steps = tuple(steps)
+        # the same for all the tests of a suite
+        self.formatted_path = intern_string(formatted_path)
+        self.suite = suite
+        self.test_status = test_status
+        self.test_documentation = test_documentation
+        self.status_message = status_message
+        self.elapsedtime = elapsedtime
+        self.custom_fields = None
+
+    def __getitem__(self, key):
+        if key not in self.FIELDS and self.custom_fields and key in self.custom_fields:
+            return self.custom_fields[key]
+        return super().__getitem__(key)
+
+    def __setitem__(self, key, value):
+        if key in self.FIELDS or not key.startswith("custom_"):
+            super().__setitem__(key, value)
+            return
+        if self.custom_fields is None:
+            self.custom_fields = {}
+        self.custom_fields[key] = value
+
+    def __contains__(self, key):
+        return super().__contains__(key) or bool(
+            self.custom_fields and key in self.custom_fields
+        )
+
+    @property
+    def suite_id(self):
+        return self.suite.id
+
+    @property
+    def suite_source(self):
+        return self.suite.source
+
+    @property
+    def suite_documentation(self):
+        return self.suite.documentation
+
+    def to_dict(self):
+        data = super().to_dict()
+        data["steps"] = [step.to_dict() for step in self.steps]
+        return data
+
+    @classmethod
+    def from_dict(cls, data, suite):
+        """Returns the record of a dict of the base fields, e.g. from the parse cache."""
+        return cls(
+            data["title"],
+            data["tags"],
+            [TestStep(**step) for step in data["steps"]],
+            data["formatted_path"],
+            suite,
+            data["test_status"],
+            data["test_documentation"],
+            data["status_message"],
+            data["elapsedtime"],
+        )
+
+
+class RobotTestInventory:
+    """
+    The tests of an inventory and their classification by TestRail IDs.
+
+    The classification is kept as arrays of test indexes (the index of a
+    test is also its "id"). The lists that the sync reads, e.g.
+    inventory["tests_with_one_tr_id"], are built when they are read.
+    """
+
+    __slots__ = ("tests", "one_tr_id", "multiple_tr_ids", "no_tr_id")
+
+    def __init__(self, tests):
+        self.tests = tests
+        self.one_tr_id = array("l")
+        self.multiple_tr_ids = array("l")
+        self.no_tr_id = array("l")
+        for index, test in enumerate(tests):
+            if len(test.tr_ids) == 1:
+                self.one_tr_id.append(index)
+            elif test.tr_ids:
+                self.multiple_tr_ids.append(index)
+            else:
+                self.no_tr_id.append(index)
+
+    def _get_tests(self, indexes):
+        return [self.tests[index] for index in indexes]
+
+    def __getitem__(self, key):
+        if key == "tests":
+            return self.tests
+        if key == "tests_with_one_tr_id":
+            return self._get_tests(self.one_tr_id)
+        if key == "tests_with_multiple_tr_ids":
+            return self._get_tests(self.multiple_tr_ids)
+        if key == "tests_without_tr_id":
+            return self._get_tests(self.no_tr_id)
+        if key == "multiple_tr_ids":
+            return list(self.multiple_tr_ids)
+        if key == "no_tr_id":
+            return list(self.no_tr_id)
+        if key == "all_tr_ids":
+            return [tr_id for test in self.tests for tr_id in test.tr_ids]
+        raise KeyError(key)
@@ -0,0 +1,77 @@
+import threading
+
+
+class SectionIndex:
+    """
+    The sections of a suite, indexed by ID, formatted path and parent.
+
+    Built once from get_sections, then kept up to date with the sections
+    returned by add_section, so the sections do not have to be read again
+    while they are created. The formatted path of a section is the names
+    from its top-level section, joined with " > ", like the robot tests'.
+
+    When several sections have the same path, the first one is used for the
+    path, as before.
+    """
+
+    def __init__(self, sections=()):
+        self._lock = threading.Lock()
+        self.by_id = {}
+        self.by_path = {}
+        self.children = {}
+        sections = list(sections)
+        for section in sections:
+            self.by_id[section["id"]] = section
+        for section in sections:
+            self._index(section)
+
+    def _get_formatted_path(self, section):
+        # the paths of the parents are resolved first, whatever the order
+        # of the sections
+        names = []
+        while section is not None and "formatted_path" not in section:
+            names.append(section["name"])
+            section = self.by_id.get(section["parent_id"])
+        if section is not None:
+            names.append(section["formatted_path"])
+        return " > ".join(reversed(names))
+
+    def _index(self, section):
+        section["formatted_path"] = self._get_formatted_path(section)
+        self.by_path.setdefault(section["formatted_path"], section)
+        self.children.setdefault(section["parent_id"], []).append(section)
+
+    def add(self, section):
+        """Indexes a section returned by add_section and returns it."""
+        with self._lock:
+            self.by_id[section["id"]] = section
+            self._index(section)
+        return section
+
+    def get(self, formatted_path):
+        return self.by_path.get(formatted_path)
+
+    def get_by_name(self, name):
+        """Returns the first section with the name, at any depth, or None."""
+        for section in self.by_id.values():
+            if section["name"] == name:
+                return section
+        return None
+
+    def get_id(self, formatted_path):
+        section = self.by_path.get(formatted_path)
+        return section["id"] if section else None
+
+    def get_children(self, section_id):
+        """Returns the subsections of a section, or the top-level ones for None."""
+        return self.children.get(section_id, [])
+
+    def __contains__(self, formatted_path):
+        return formatted_path in self.by_path
+
+    def __len__(self):
+        return len(self.by_id)
+
+    @property
+    def sections(self):
+        return list(self.by_id.values())
@@ -0,0 +1,59 @@
+import threading
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent identical calls.
+
+    The first caller for a key runs the function; callers that arrive while
+    it is still running wait for it and get the same result (or exception).
+    Nothing is cached after the call has finished.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, func):
+        with self._lock:
+            call = self._calls.get(key)
+            is_leader = call is None
+            if is_leader:
+                call = _Call()
+                self._calls[key] = call
+
+        if not is_leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = func()
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                if self._calls.get(key) is call:
+                    del self._calls[key]
+            call.event.set()
+        return call.result
+
+    def forget(self, prefix):
+        """
+        Detaches the in-flight calls whose key starts with the prefix.
+
+        Callers arriving later start a new call instead of joining a call
+        that may have started before a write.
+        """
+        with self._lock:
+            for key in [k for k in self._calls if k.startswith(prefix)]:
+                del self._calls[key]
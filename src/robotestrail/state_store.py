@@ -0,0 +1,95 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from robotestrail.logging_config import setup_logging
+
+
+def get_payload_hash(payload):
+    return hashlib.sha256(
+        json.dumps(payload, sort_keys=True, default=str).encode("utf-8")
+    ).hexdigest()
+
+
+def get_case_key(case_id):
+    # C01 and C1 are the same case: one row per case, however it is tagged
+    return str(int(case_id))
+
+
+class CaseStateStore:
+    """
+    SQLite file with the hash of the last payload written to each TestRail case.
+
+    A case whose payload hash matches the stored one was already synced with
+    the same content, so the sync can skip it without reading it from
+    TestRail. The entries are namespaced by TestRail URL, so one file can be
+    shared (e.g. in a CI cache) by several TestRail instances.
+    """
+
+    def __init__(self, path, namespace):
+        self.logger = setup_logging()
+        self.path = os.path.expanduser(path)
+        self.namespace = namespace
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(self.path, check_same_thread=False)
+        with self._lock, self._connection:
+            # WAL without a full fsync per commit: a lost entry only costs one
+            # extra write on the next sync
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS case_state ("
+                "namespace TEXT NOT NULL, "
+                "case_id TEXT NOT NULL, "
+                "payload_hash TEXT NOT NULL, "
+                "updated_at REAL NOT NULL, "
+                "PRIMARY KEY (namespace, case_id))"
+            )
+        self.logger.debug(f"Case state store opened: {self.path}")
+
+    def get(self, case_id):
+        """Returns the stored payload hash of the case, or None."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT payload_hash FROM case_state WHERE namespace = ? AND case_id = ?",
+                (self.namespace, get_case_key(case_id)),
+            ).fetchone()
+        return row[0] if row else None
+
+    def set(self, case_id, payload_hash):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO case_state (namespace, case_id, payload_hash, updated_at) "
+                "VALUES (?, ?, ?, ?)",
+                (self.namespace, get_case_key(case_id), payload_hash, time.time()),
+            )
+
+    def delete(self, case_id):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM case_state WHERE namespace = ? AND case_id = ?",
+                (self.namespace, get_case_key(case_id)),
+            )
+
+    def is_empty(self):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT 1 FROM case_state WHERE namespace = ? LIMIT 1", (self.namespace,)
+            ).fetchone()
+        return row is None
+
+    def clear(self):
+        """Removes all the entries of this TestRail URL."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                "DELETE FROM case_state WHERE namespace = ?", (self.namespace,)
+            )
+        self.logger.info(f"Case state store cleared: {self.path}")
+
+    def close(self):
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,209 @@
+import functools
+import hashlib
+import json
+import os
+import threading
+import time
+from robotestrail.logging_config import setup_logging
+
+# Mutating endpoints whose calls are journaled
+JOURNALED_ENDPOINTS = (
+    "add_section",
+    "add_case",
+    "update_case",
+    "move_cases_to_section",
+    "add_plan",
+    "add_plan_entry",
+    "add_results_for_cases",
+)
+
+# Endpoints whose response bodies are not used by the callers and not journaled
+UNKEPT_RESPONSE_ENDPOINTS = ("add_results_for_cases",)
+
+
+def get_call_key(url, payload):
+    call = url.split("/api/v2/", 1)[-1]
+    return hashlib.sha256(
+        f"{call}|{json.dumps(payload, sort_keys=True, default=str)}".encode("utf-8")
+    ).hexdigest()
+
+
+def journaled(command):
+    """
+    Decorator that journals the TestRail writes of a TestSyncManager command.
+
+    The journal is removed when the command returns. It is kept when the
+    command is interrupted, so the same command can be run again with --resume.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            self.tr_api.journal.start(command)
+            result = func(self, *args, **kwargs)
+            self.tr_api.journal.finish()
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+class JournaledResponse:
+    """Successful response of a call replayed from the journal."""
+
+    status_code = 200
+
+    def __init__(self, body):
+        self.content = json.dumps(body).encode("utf-8")
+        self.headers = {"Content-Type": "application/json"}
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class SyncJournal:
+    """
+    Write-ahead journal (JSON lines) of the TestRail writes of one command.
+
+    A "begin" line is written before a call is sent and a "done" line with
+    the response after TestRail accepted it. When an interrupted command is
+    resumed, the calls with a "done" line are answered from the journal
+    instead of being sent again, e.g. add_section returns the section that
+    was created by the interrupted run.
+
+    Identical calls are matched in order: the n-th identical call of the
+    resumed run gets the response of the n-th one of the interrupted run.
+    Values that have to be the same in the resumed run (like the timestamp
+    in the test plan name) are kept with get_context.
+    """
+
+    def __init__(self, path, enabled=True, resume=False):
+        self.logger = setup_logging()
+        self.path = os.path.expanduser(path)
+        self.enabled = enabled
+        self.resume = resume
+        self._lock = threading.Lock()
+        self._file = None
+        self._context = {}
+        self._done = {}
+        self._replayed = {}
+
+    def _load(self):
+        """Returns the command, context, done responses and the unfinished call count of the journal."""
+        command, context, done, begun = None, {}, {}, 0
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # the last line of a killed run can be incomplete
+                        continue
+                    if entry["type"] == "run":
+                        command = entry["command"]
+                    elif entry["type"] == "context":
+                        context[entry["key"]] = entry["value"]
+                    elif entry["type"] == "begin":
+                        begun += 1
+                    elif entry["type"] == "done":
+                        begun -= 1
+                        done.setdefault(entry["key"], []).append(entry["response"])
+        except FileNotFoundError:
+            return None, {}, {}, 0
+        return command, context, done, begun
+
+    def _write(self, entry):
+        self._file.write(json.dumps(entry) + "\n")
+        # flushed to the OS, so the line survives a killed process
+        self._file.flush()
+
+    def start(self, command):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._replayed = {}
+            previous_command, context, done, begun = self._load()
+            if self.resume and previous_command == command:
+                self._context, self._done = context, done
+                self._file = open(self.path, "a", encoding="utf-8")
+                self.logger.info(
+                    f"Resuming '{command}' from the journal: {sum(len(d) for d in done.values())} calls were already done"
+                )
+                if begun > 0:
+                    self.logger.warning(
+                        f"{begun} calls of the interrupted run have no recorded response and will be sent again"
+                    )
+                return
+
+            if self.resume:
+                self.logger.warning(f"There is no interrupted '{command}' run to resume in '{self.path}'")
+            elif previous_command is not None:
+                self.logger.warning(
+                    f"The journal of an interrupted '{previous_command}' run is discarded. Use --resume to continue an interrupted run"
+                )
+            self._context, self._done = {}, {}
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            self._file = open(self.path, "w", encoding="utf-8")
+            self._write({"type": "run", "command": command, "started_at": time.time()})
+
+    def get_context(self, key, default):
+        """Returns the value kept for the key, or keeps and returns the default."""
+        with self._lock:
+            if key in self._context:
+                return self._context[key]
+            self._context[key] = default
+            if self._file is not None:
+                self._write({"type": "context", "key": key, "value": default})
+            return default
+
+    def before_call(self, endpoint, url, payload):
+        """
+        Journals a call before it is sent.
+
+        Returns:
+            tuple: The key to pass to after_call (None if the call is not
+                journaled) and the replayed response (None if the call has to
+                be sent).
+        """
+        if self._file is None or endpoint not in JOURNALED_ENDPOINTS:
+            return None, None
+        key = get_call_key(url, payload)
+        with self._lock:
+            index = self._replayed.get(key, 0)
+            responses = self._done.get(key, [])
+            if index < len(responses):
+                self._replayed[key] = index + 1
+                self.logger.debug(f"Replayed from the journal: {endpoint}")
+                return None, JournaledResponse(responses[index])
+            self._write({"type": "begin", "endpoint": endpoint, "key": key})
+        return key, None
+
+    def after_call(self, endpoint, key, response):
+        if key is None or response.status_code != 200:
+            return
+        body = None
+        if endpoint not in UNKEPT_RESPONSE_ENDPOINTS:
+            try:
+                body = response.json()
+            except ValueError:
+                body = None
+        with self._lock:
+            if self._file is not None:
+                self._write({"type": "done", "endpoint": endpoint, "key": key, "response": body})
+
+    def finish(self):
+        """Removes the journal of a command that completed."""
+        with self._lock:
+            if self._file is None:
+                return
+            self._file.close()
+            self._file = None
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
@@ -0,0 +1,135 @@
+import re
+from robotestrail.logging_config import setup_logging
+from robotestrail.robot_test_records import TestRecord
+
+logger = setup_logging()
+
+# The built-in "<prefix>:<value>" tags. Rules of the config with the same
+# prefix replace them.
+DEFAULT_TAG_RULES = [
+    {"prefix": "priority_id", "field": "priority_id", "type": "int"},
+    {"prefix": "priority", "field": "priority"},
+    {"prefix": "type_id", "field": "type_id", "type": "int"},
+    {"prefix": "type", "field": "type"},
+    {"prefix": "estimate", "field": "estimate", "default": None},
+    {"prefix": "automation_type_id", "field": "custom_automation_type", "type": "int"},
+    {"prefix": "automation_type", "field": "custom_automation_type"},
+    {"prefix": "automatedby_id", "field": "custom_automatedby_id", "type": "int"},
+    {"prefix": "customer", "field": "custom_customer", "type": "int"},
+    {"prefix": "milestone", "field": "milestone"},
+    {"prefix": "milestone_id", "field": "milestone_id", "type": "int"},
+    {"prefix": "refs", "field": "refs", "type": "list"},
+    {"prefix": "jira", "field": ["refs", "defects"], "type": "list"},
+    {"prefix": "defect", "field": "defects", "type": "list"},
+    {"prefix": "bug", "field": "defects", "type": "list"},
+]
+
+# Tags that are TestRail case IDs, e.g. C123456
+DEFAULT_TR_ID_PATTERN = r"C\d{2,9}"
+
+# Fields a rule can set besides the custom_* fields
+TAG_RULE_FIELDS = (
+    "priority_id",
+    "priority",
+    "type_id",
+    "type",
+    "estimate",
+    "milestone",
+    "milestone_id",
+    "refs",
+    "defects",
+)
+
+TAG_VALUE_TYPES = {"str": str, "int": int, "list": str}
+
+
+class TagRules:
+    """
+    The tag grammar, compiled once into a dispatch table.
+
+    A "<prefix>:<value>" tag is dispatched with one dict lookup on its
+    prefix, whatever the number of rules. Other tags are matched against
+    the TestRail ID pattern, anchored at both ends. The value is the text
+    up to the next ":".
+
+    A rule (see DEFAULT_TAG_RULES) sets one or several fields:
+        type "str" (default) or "int": the last tag wins, an invalid value
+            is logged and ignored.
+        type "list": the values of all the tags, joined with ", ", or None.
+        default: the value of the field when no tag sets it.
+
+    Args:
+        rules (list): Rules of the config, added to the built-in ones.
+        tr_id_pattern (str): Regular expression of the TestRail ID tags.
+            The tags keep their one-letter prefix, e.g. C123.
+    """
+
+    def __init__(self, rules=None, tr_id_pattern=None):
+        self._dispatch = {}
+        rules_by_prefix = {}
+        for rule in DEFAULT_TAG_RULES + list(rules or []):
+            rules_by_prefix[str(rule["prefix"]).rstrip(":")] = rule
+
+        self.defaults = {}
+        self.list_fields = []
+        # the custom fields that are sent to TestRail as they are, see
+        # TestRecord.custom_fields
+        self.custom_fields = []
+        for prefix, rule in rules_by_prefix.items():
+            value_type = rule.get("type", "str")
+            if value_type not in TAG_VALUE_TYPES:
+                raise ValueError(f"Unknown type '{value_type}' in the tag rule '{prefix}'")
+            fields = rule["field"]
+            fields = tuple(fields) if isinstance(fields, (list, tuple)) else (fields,)
+            for field in fields:
+                if field == "custom_fields" or (
+                    field not in TAG_RULE_FIELDS and not field.startswith("custom_")
+                ):
+                    raise ValueError(
+                        f"The tag rule '{prefix}' cannot set the field '{field}'"
+                    )
+                if field not in TestRecord.FIELDS and field not in self.custom_fields:
+                    self.custom_fields.append(field)
+                if value_type == "list":
+                    if field not in self.list_fields:
+                        self.list_fields.append(field)
+                elif "default" in rule:
+                    self.defaults[field] = rule["default"]
+            self._dispatch[prefix] = (
+                fields,
+                TAG_VALUE_TYPES[value_type],
+                value_type == "list",
+            )
+        self._match_tr_id = re.compile(
+            f"(?:{tr_id_pattern or DEFAULT_TR_ID_PATTERN})"
+        ).fullmatch
+
+    def apply(self, test):
+        """Sets the fields of the tags of a test and its tr_ids, in one pass over its tags."""
+        values = dict(self.defaults)
+        lists = {field: [] for field in self.list_fields}
+        tr_ids = []
+        for tag in test["tags"]:
+            prefix, separator, rest = tag.partition(":")
+            rule = self._dispatch.get(prefix) if separator else None
+            if rule is None:
+                if self._match_tr_id(tag):
+                    tr_ids.append(tag)
+                continue
+            fields, convert, is_list = rule
+            try:
+                value = convert(rest.split(":", 1)[0])
+            except ValueError as e:
+                logger.error(f"Unable to parse tag: '{tag}' ] Error: {e}")
+                continue
+            for field in fields:
+                if is_list:
+                    lists[field].append(value)
+                else:
+                    values[field] = value
+
+        for field, value in values.items():
+            test[field] = value
+        for field, items in lists.items():
+            test[field] = ", ".join(items) if items else None
+        test["tr_ids"] = tuple(tr_ids)
@@ -1,14 +1,26 @@
 import os
 import csv
+import threading
 from collections import Counter
 from robotestrail.logging_config import *
 from robotestrail.testrail_api_manager import TestRailApiManager
+from robotestrail.results_uploader import ResultsUploader
+from robotestrail.metrics import timed_phase
+from robotestrail.case_diff import (
+    DIFF_FIELDS,
+    CaseDiffStats,
+    diff_case,
+    get_diff_snapshot,
+)
+from robotestrail.state_store import CaseStateStore, get_payload_hash
+from robotestrail.sync_journal import journaled
+from robotestrail.parse_cache import ParseCache
+from robotestrail.tag_rules import TagRules
 from robotestrail.robot_framework_utils import (
-    run_dryrun_and_get_tests_with_additional_info,
-    parse_robot_output_xml,
-    add_additional_info_to_parsed_robot_tests,
+    get_robot_tests_with_additional_info,
+    iter_robot_test_results,
 )
-from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 import json
 
@@ -18,6 +30,23 @@ class TestSyncManager:
         self.logger = setup_logging()
         self.config = config
         self.tr_api = TestRailApiManager(self.config)
+        self.metrics = self.tr_api.metrics
+        self.tag_rules = TagRules(
+            self.config.get_tag_rules(), self.config.get_tr_id_pattern()
+        )
+        # the custom fields of the tag rules are diffed like the built-in ones
+        self.diff_fields = DIFF_FIELDS + tuple(self.tag_rules.custom_fields)
+        self.state_store = None
+        if self.config.get_state_path():
+            self.state_store = CaseStateStore(
+                self.config.get_state_path(), self.tr_api.base_url
+            )
+            if self.config.get_full_sync():
+                self.state_store.clear()
+        # memoized lookups shared by the worker threads, see _resolve
+        self._resolved = {}
+        self._resolve_lock = threading.Lock()
+        self._resolve_key_locks = {}
         self.project_id = self.tr_api.get_project_id()
         self.milestones = self.tr_api.get_milestones(self.project_id)['milestones']
 
@@ -31,6 +60,49 @@ class TestSyncManager:
             return
         self.logger.debug("TestSyncManager initialized")
 
+    @timed_phase("inventory")
+    def _get_robot_tests_inventory(self, profile="sync"):
+        """
+        Returns the robot tests with additional info, see robot.inventory_mode.
+
+        Args:
+            profile (str): The extraction profile, see EXTRACTION_PROFILES.
+        """
+        parse_cache = None
+        if self.config.get_robot_parse_cache_enabled():
+            parse_cache = ParseCache(self.config.get_robot_parse_cache_path())
+        return get_robot_tests_with_additional_info(
+            self.config.get_robot_tests_folder_path(),
+            self.config.get_robot_inventory_mode(),
+            "dry_run_output.xml",
+            parse_cache,
+            self.config.get_robot_inventory_workers(),
+            self.config.get_robot_inventory_shard_strategy(),
+            profile,
+            self.tag_rules,
+        )
+
+    def _iter_robot_tests_from_output(self, output_file):
+        # Streamed while the results are uploaded, so its time is in the
+        # "results" phase
+        return iter_robot_test_results(output_file, self.tag_rules)
+
+    def close(self):
+        if self.state_store is not None:
+            self.state_store.close()
+        self.tr_api.close()
+
+    def _get_run_timestamp(self):
+        # Kept in the journal, so a resumed run sends the same plan and run names
+        return self.tr_api.journal.get_context(
+            "timestamp", datetime.now().strftime("%Y-%m-%d %H:%M")
+        )
+
+    def report_metrics(self):
+        self.metrics.report(
+            self.config.get_metrics_output_file(), self.config.get_metrics_format()
+        )
+
     def _log_tests_without_tr_id(self, tests):
         """
         Logs the tests that do not have a TestRail ID.
@@ -85,6 +157,64 @@ class TestSyncManager:
         else:
             self.logger.info("No duplicate TestRail IDs found.")
 
+    def _get_cases_by_title(self, cases):
+        """
+        Returns the TestRail cases by title, for the sync and results by name.
+
+        The cases with the same title cannot be told apart by name: the first
+        one is used for the title and the others are logged.
+
+        Args:
+            cases (iterable): The TestRail cases.
+
+        Returns:
+            dict: The first case of each title.
+        """
+        cases_by_title = {}
+        duplicate_ids = {}
+        for case in cases:
+            first_case = cases_by_title.setdefault(case["title"], case)
+            if first_case is not case:
+                duplicate_ids.setdefault(case["title"], [first_case["id"]]).append(
+                    case["id"]
+                )
+        if duplicate_ids:
+            message = "The following TestRail case titles are present several times, only the first case is matched by name\n"
+            for title, case_ids in duplicate_ids.items():
+                message += f" - {title}: {', '.join(f'C{case_id}' for case_id in case_ids)}\n"
+            self.logger.warning(message)
+        return cases_by_title
+
+    def _run_in_parallel(self, func, items):
+        """
+        Runs the function for every item in a thread pool.
+
+        The pool is sized to the upper concurrency limit of the rate governor;
+        the governor decides how many of the workers may talk to TestRail at
+        once. Errors raised by the workers are logged instead of being lost.
+
+        Args:
+            func (callable): The function to run.
+            items (iterable): The arguments for the function.
+
+        Returns:
+            list: The results in the order of the items, None for failed items.
+        """
+        results = []
+        failed = 0
+        with ThreadPoolExecutor(max_workers=self.tr_api.governor.max_limit) as executor:
+            futures = [executor.submit(func, item) for item in items]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    failed += 1
+                    results.append(None)
+                    self.logger.error(f"Error in {getattr(func, '__name__', func)}: {e}")
+        if failed:
+            self.logger.error(f"{failed} of {len(futures)} operations failed")
+        return results
+
     def _get_custom_automation_type(self, test):
         if test.get("custom_automation_type"):
             custom_automation_type_id = self._get_custom_automation_type_id_by_name(
@@ -140,119 +270,188 @@ class TestSyncManager:
             custom_automation_type = test["custom_automation_type"]
         return custom_automation_type
 
+    @journaled("results_by_name")
     def add_new_test_results_by_name(self):
         self.logger.info("Adding new test results to TestRail by name")
         project_id = self.project_id
         suite_id = self.tr_api.get_tr_suite_by_name(
             project_id, self.config.get_test_suite()
         )["id"]
-        test_plan = self.tr_api.get_tr_test_plan_by_name(
-            project_id, self.config.get_test_plan_name()
-        )
-        test_run_name = f"{self.config.get_test_run_name()} - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
-        test_run = self.tr_api.add_run_to_plan(
-            plan_id=test_plan["id"],
-            suite_id=suite_id,
-            name=test_run_name,
-            description=self.config.get_test_run_description(),
-            include_all=True,
-        )
+        output_file = self.config.get_robot_output_xml_file_path()
+
+        # A failed upload of the same output.xml is resumed in its run
+        results_uploader = ResultsUploader(self.tr_api, self.config, "results_by_name")
+        test_run_id = results_uploader.load_run_id(output_file)
+        if test_run_id is None:
+            test_plan = self.tr_api.get_tr_test_plan_by_name(
+                project_id, self.config.get_test_plan_name()
+            )
+            test_run_name = f"{self.config.get_test_run_name()} - {self._get_run_timestamp()}"
+            test_run = self.tr_api.add_run_to_plan(
+                plan_id=test_plan["id"],
+                suite_id=suite_id,
+                name=test_run_name,
+                description=self.config.get_test_run_description(),
+                include_all=True,
+            )
+            test_run_id = test_run["runs"][0]["id"]
+            results_uploader.start(test_run_id)
 
         # Set testrail test run results based on the robot output.xml file
         self.set_test_results(
-            project_id,
-            suite_id,
-            test_run["runs"][0]["id"],
-            self.config.get_robot_output_xml_file_path(),
+            project_id, suite_id, test_run_id, output_file, results_uploader
         )
 
+    @journaled("sync_by_name")
     def sync_robot_test_by_name(self):
         self.logger.info("Syncing robot tests with the TestRail by name")
-        path_to_tests = self.config.get_robot_tests_folder_path()
         root_section_name = self.config.get_root_test_section_name()
         project_id = self.project_id
         suite_id = self.tr_api.get_tr_suite_by_name(
             project_id, self.config.get_test_suite()
         )["id"]
-        existing_tr_tests = self.tr_api.get_cases(project_id, suite_id)["cases"]
-        root_section = self.tr_api.get_section_by_name(
-            project_id, suite_id, root_section_name
-        )
-        if not root_section:
-            self.tr_api.add_section(project_id, suite_id, root_section_name)
-        robot_tests = run_dryrun_and_get_tests_with_additional_info(
-            path_to_tests, "dry_run_output.xml"
-        )
-        self.add_folders_to_testrail(
-            project_id, suite_id, robot_tests, self.config.get_source_control_link()
+        # The existing cases are streamed page by page in the background while
+        # the robot tests are collected and the sections are synced
+        pipelined = self.config.get_sync_pipeline()
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            existing_cases_future = executor.submit(
+                lambda: self._get_cases_by_title(
+                    self._get_existing_cases(project_id, suite_id)
+                )
+            )
+            # The sections are read once, the created ones are added to the index
+            section_index = self.tr_api.get_section_index(project_id, suite_id)
+            if root_section_name not in section_index:
+                section_index.add(
+                    self.tr_api.add_section(project_id, suite_id, root_section_name)
+                )
+            robot_tests = self._get_robot_tests_inventory()
+            if pipelined:
+                self.sync_tests_by_name_pipelined(
+                    project_id, suite_id, robot_tests, section_index, existing_cases_future
+                )
+                return
+            self.add_folders_to_testrail(
+                project_id,
+                suite_id,
+                robot_tests,
+                self.config.get_source_control_link(),
+                section_index,
+            )
+            existing_cases_by_title = existing_cases_future.result()
+        self.add_tests_to_testrail(
+            project_id, suite_id, existing_cases_by_title, robot_tests, section_index
         )
-        self.add_tests_to_testrail(project_id, suite_id, existing_tr_tests, robot_tests)
         self.update_tests_in_testrail(
-            project_id, suite_id, existing_tr_tests, robot_tests
+            project_id, suite_id, existing_cases_by_title, robot_tests, section_index
+        )
+        self.move_orphan_tests_to_orphan_folder(
+            project_id, suite_id, robot_tests, section_index
         )
-        self.move_orphan_tests_to_orphan_folder(project_id, suite_id, robot_tests)
 
+    @journaled("sync_by_id")
     def sync_tests_by_id(self):
         self.logger.info("Starting test sync process")
         self.logger.info(f"Project ID: {self.tr_api.get_project_id()}")
 
-        # Get all robot tests by running robot dry-run and parsing the output.xml
-        path_to_tests = self.config.get_robot_tests_folder_path()
-        robot_tests = run_dryrun_and_get_tests_with_additional_info(
-            path_to_tests, "dry_run_output.xml"
-        )
+        # The cases of the suite are fetched once, while the robot tests are collected,
+        # to skip the updates of the unchanged cases
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            existing_cases_future = None
+            if self._should_diff_with_server():
+                suite = self.tr_api.get_tr_suite_by_name(
+                    self.project_id, self.config.get_test_suite()
+                )
+                if suite is None:
+                    self._log_no_suite_to_diff()
+                else:
+                    existing_cases_future = executor.submit(
+                        self._get_existing_cases, self.project_id, suite["id"]
+                    )
+            # Get all robot tests with a dry-run or a static parse, see robot.inventory_mode
+            robot_tests = self._get_robot_tests_inventory()
+            existing_cases = {}
+            if existing_cases_future is not None:
+                existing_cases = {
+                    str(case["id"]): case for case in existing_cases_future.result()
+                }
 
         self._log_tests_without_tr_id(robot_tests["tests_without_tr_id"])
         self._log_tests_with_multiple_tr_ids(robot_tests["tests_with_multiple_tr_ids"])
         self._log_tests_with_duplicate_tr_ids(robot_tests["all_tr_ids"])
 
+        stats = CaseDiffStats()
         if self.max_workers:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                self.logger.info(
-                    f"Syncing tests with one TestRail ID\nThe following number of tests with single TestRail ID will be synced: {len(robot_tests['tests_with_one_tr_id'])}"
-                )
-                executor.map(
-                    self._sync_test_with_one_tr_id, robot_tests["tests_with_one_tr_id"]
-                )
+            self.logger.info(
+                f"Syncing tests with one TestRail ID\nThe following number of tests with single TestRail ID will be synced: {len(robot_tests['tests_with_one_tr_id'])}"
+            )
+            self._run_in_parallel(
+                lambda test: self._sync_test_with_one_tr_id(test, existing_cases, stats),
+                robot_tests["tests_with_one_tr_id"],
+            )
         else:
-            self._sync_tests_with_one_tr_id(robot_tests["tests_with_one_tr_id"])
+            self._sync_tests_with_one_tr_id(
+                robot_tests["tests_with_one_tr_id"], existing_cases, stats
+            )
 
         if self.max_workers:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                self.logger.info(
-                    f"Syncing tests with multiple TestRail IDs\nThe following number of tests with multiple TestRail IDs will be synced: {len(robot_tests['tests_with_multiple_tr_ids'])}"
-                )
-                executor.map(
-                    self._sync_test_with_multiple_tr_ids,
-                    robot_tests["tests_with_multiple_tr_ids"],
-                )
+            self.logger.info(
+                f"Syncing tests with multiple TestRail IDs\nThe following number of tests with multiple TestRail IDs will be synced: {len(robot_tests['tests_with_multiple_tr_ids'])}"
+            )
+            self._run_in_parallel(
+                lambda test: self._sync_test_with_multiple_tr_ids(test, existing_cases, stats),
+                robot_tests["tests_with_multiple_tr_ids"],
+            )
         else:
             self._sync_tests_with_multiple_tr_ids(
-                robot_tests["tests_with_multiple_tr_ids"]
+                robot_tests["tests_with_multiple_tr_ids"], existing_cases, stats
             )
+        self.logger.info(f"Test case updates: {stats}")
 
+    @journaled("results_by_id")
     def set_results_by_id(self):
         self.logger.info("Starting sety tests rusults by id process")
         project_id = self.project_id
         self.logger.info(f"Project ID: {project_id}")
-        path_to_tests = self.config.get_robot_tests_folder_path()
 
-        dry_run_tests = run_dryrun_and_get_tests_with_additional_info(
-            path_to_tests, "dry_run_output.xml"
-        )
+        dry_run_tests = self._get_robot_tests_inventory("results")
         all_case_ids = [t[1:] for t in dry_run_tests["all_tr_ids"]]
         output_file_path = self.config.get_robot_output_xml_file_path()
-        robot_tests = parse_robot_output_xml(output_file_path)
-        robot_tests = add_additional_info_to_parsed_robot_tests(robot_tests)
+
+        # A failed upload of the same output.xml is resumed in its run
+        results_uploader = ResultsUploader(self.tr_api, self.config, "results_by_id")
+        run_id = results_uploader.load_run_id(output_file_path)
+        if run_id is None:
+            run_id = self._add_test_run_for_results_by_id(project_id, all_case_ids)
+            if run_id is None:
+                return
+            results_uploader.start(run_id)
+
+        self.logger.info(f"Adding results to test run: {run_id}")
+        with self.metrics.phase("results"):
+            results_uploader.upload(
+                run_id,
+                self._iter_results_by_tr_ids(
+                    self._iter_robot_tests_from_output(output_file_path)
+                ),
+            )
+
+    def _add_test_run_for_results_by_id(self, project_id, all_case_ids):
+        """
+        Creates the test plan and the test run for the results by TestRail IDs.
+
+        Returns:
+            int or None: The ID of the test run, or None if it was not created.
+        """
         #test_plan = self.tr_api.get_tr_test_plan_by_name(
         #    project_id, self.config.get_test_plan_name()
         #)
 
-        milestone_id = self.tr_api.get_milestone_id_by_name(project_id, self.config.get_test_plan_milestone_name())
+        milestone_id = self._get_milestone_id_by_name(self.config.get_test_plan_milestone_name())
 
         test_plan = self.tr_api.add_plan(
             project_id, 
-            f"{self.config.get_test_plan_name()} | {datetime.now().strftime('%Y-%m-%d %H:%M')}",
+            f"{self.config.get_test_plan_name()} | {self._get_run_timestamp()}",
             self.config.get_test_plan_description(),
             milestone_id=milestone_id
         )
@@ -261,14 +460,13 @@ class TestSyncManager:
         suite = self.tr_api.get_tr_suite_by_name(
             project_id, self.config.get_test_suite()
         )
-        test_run_name = f"{self.config.get_test_run_name()} - {datetime.now().strftime('%Y-%m-%d %H:%M')}"
+        test_run_name = f"{self.config.get_test_run_name()} - {self._get_run_timestamp()}"
 
         assignedto_id = None
         if self.config.get_test_run_assignedto_email():
-            user = self.tr_api.get_user_by_email(
+            assignedto_id = self._get_user_id_by_email(
                 self.config.get_test_run_assignedto_email()
             )
-            assignedto_id = user["id"]
 
         try:
             test_run = self.tr_api.add_run_to_plan(
@@ -286,12 +484,23 @@ class TestSyncManager:
             self.logger.error(
                 f"Project '{self.config.get_project_name()}' does not have test plan with name '{self.config.get_test_plan_name()}'\nError adding test run to test plan: {e}"
             )
-            return
+            return None
 
-        results = []
-        self.logger.info(f"Adding results to test run '{test_run_name}'")
+        self.logger.info(f"Test run created: '{test_run_name}'")
+        return test_run["runs"][0]["id"]
 
-        for test in robot_tests["tests"]:
+    def _iter_results_by_tr_ids(self, robot_tests):
+        """
+        Yields the TestRail results for every TestRail ID tagged on the robot tests.
+
+        Args:
+            robot_tests (iterable): The test records of the output.xml, see
+                iter_robot_test_results.
+
+        Yields:
+            dict: The results for add_results_for_cases.
+        """
+        for test in robot_tests:
 
             for tr_id in test["tr_ids"]:
                 formatted_elapsed = f"{str(round(test.get('elapsedtime', 0)/1000))}s"
@@ -307,22 +516,15 @@ class TestSyncManager:
                 elapsed = formatted_elapsed or None
                 version = test.get("version") or None
                 defects = test.get("defects") or None
-                assignedto_id = assignedto_id or None
                 # milestone_id = milestone_id
-                results.append(
-                    {
-                        "case_id": case_id,
-                        "status_id": status_id,
-                        "comment": comment,
-                        "elapsed": elapsed,
-                        "version": version,
-                        "defects": defects,
-                    }
-                )
-
-        self.tr_api.add_results_for_cases(
-            test_run["runs"][0]["id"], {"results": results}
-        )
+                yield {
+                    "case_id": case_id,
+                    "status_id": status_id,
+                    "comment": comment,
+                    "elapsed": elapsed,
+                    "version": version,
+                    "defects": defects,
+                }
 
     def _get_testrail_status_by_robot_status(self, robot_status):
         """
@@ -364,9 +566,9 @@ class TestSyncManager:
                 f"Error: TestRail API key environment variable '{self.config.get_testrail_api_key_env_var()}' is not set"
             )
 
-        # connect to TestRail
+        # connect to TestRail (the projects may come from the metadata cache)
         try:
-            self.tr_api.get_projects()
+            self.tr_api.get_current_user()
         except Exception as e:
             self.logger.error(
                 f"Error connecting to TestRail: {e}\nurl: {self.config.get_testrail_url()}\nuser: {self.config.get_testrail_user()}\napi_key: {self.config.get_testrail_api_key_env_var()}"
@@ -400,9 +602,8 @@ class TestSyncManager:
             )
             
 
-        robot_tests = run_dryrun_and_get_tests_with_additional_info(
-            self.config.get_robot_tests_folder_path(), "dry_run_output.xml"
-        )
+        # Only the titles and the TestRail IDs are checked
+        robot_tests = self._get_robot_tests_inventory("results")
 
         ##write to json
         #with open("robot_tests.json", "w") as json_file:
@@ -575,52 +776,183 @@ class TestSyncManager:
         # Logic to add new test to TestRail
         pass
 
-    def _sync_tests_with_one_tr_id(self, tests):
+    def _sync_tests_with_one_tr_id(self, tests, existing_cases=None, stats=None):
         self.logger.info(
             f"Syncing tests with one TestRail ID\n The following number of tests will be synced: {len(tests)}"
         )
         for test in tests:
-            self._sync_test_with_one_tr_id(test)
-
-    def _sync_test_with_one_tr_id(self, test):
-        tr_case_id = str(test["tr_ids"][0])[1:]
-
-        self.tr_api.update_test_case(
-            case_id=tr_case_id,
-            title=test["title"],
-            steps=test["rich_text_steps"],
-            preconditions=test["formatted_tags"],
-            estimate=test["estimate"],
-            refs=test["refs"],
-            custom_customer=test.get("custom_customer"),
-            custom_automation_type=self._get_custom_automation_type(test),
-            custom_automatedby=self._get_automatedby_id(test),
-            milestone_id=self._get_milestone_id(test),
-            type_id=self._get_type_id(test),
-            priority_id=self._get_priority_id(test),
+            self._sync_test_with_one_tr_id(test, existing_cases, stats)
+
+    def _sync_test_with_one_tr_id(self, test, existing_cases=None, stats=None):
+        tr_case_id = self._get_tr_case_id(test["tr_ids"][0])
+
+        self._update_test_case_if_changed(
+            tr_case_id,
+            self._get_id_sync_case_fields(test),
+            (existing_cases or {}).get(tr_case_id),
+            stats,
         )
 
-    def _sync_tests_with_multiple_tr_ids(self, tests):
+    def _get_tr_case_id(self, tr_id):
+        # the tag of C1 can be written C01 (see tags.tr_id_pattern), TestRail
+        # returns the case ID without the leading zeros
+        return str(int(str(tr_id)[1:]))
+
+    def _get_id_sync_case_fields(self, test):
+        """
+        Returns the test case fields written for a test with one TestRail ID.
+
+        Args:
+            test (dict): The robot test.
+
+        Returns:
+            dict: Keyword arguments for update_test_case.
+        """
+        return {
+            "title": test["title"],
+            "steps": test["rich_text_steps"],
+            "preconditions": test["formatted_tags"],
+            "estimate": test["estimate"],
+            "refs": test["refs"],
+            "custom_customer": test.get("custom_customer"),
+            "custom_automation_type": self._get_custom_automation_type(test),
+            "custom_automatedby": self._get_automatedby_id(test),
+            "milestone_id": self._get_milestone_id(test),
+            "type_id": self._get_type_id(test),
+            "priority_id": self._get_priority_id(test),
+            "custom_fields": test.get("custom_fields"),
+        }
+
+    def _sync_tests_with_multiple_tr_ids(self, tests, existing_cases=None, stats=None):
         if tests:
             self.logger.info("Syncing tests with multiple TestRail IDs")
             for test in tests:
-                self._sync_test_with_multiple_tr_ids(test)
+                self._sync_test_with_multiple_tr_ids(test, existing_cases, stats)
 
-    def _sync_test_with_multiple_tr_ids(self, test):
+    def _sync_test_with_multiple_tr_ids(self, test, existing_cases=None, stats=None):
         for tr_id in test["tr_ids"]:
-            tr_case_id = str(tr_id)[1:]
-            self.tr_api.update_test_case(
-                case_id=tr_case_id,
-                custom_automation_type=self._get_custom_automation_type(test),
-                type_id=self._get_type_id(test),
-                priority_id=self._get_priority_id(test),
+            tr_case_id = self._get_tr_case_id(tr_id)
+            self._update_test_case_if_changed(
+                tr_case_id,
+                self._get_multiple_ids_sync_case_fields(test),
+                (existing_cases or {}).get(tr_case_id),
+                stats,
+            )
+
+    def _get_multiple_ids_sync_case_fields(self, test):
+        return {
+            "custom_automation_type": self._get_custom_automation_type(test),
+            "type_id": self._get_type_id(test),
+            "priority_id": self._get_priority_id(test),
+        }
+
+    def _get_existing_cases(self, project_id, suite_id):
+        """
+        Returns the cases of the suite with only the fields compared by the diff.
+        """
+        return [
+            get_diff_snapshot(case, self.diff_fields)
+            for case in self.tr_api.iter_cases(project_id, suite_id)
+        ]
+
+    def _should_diff_with_server(self):
+        """
+        Returns True if the sync by ID has to read the cases from TestRail.
+
+        With a filled state store the unchanged cases are skipped without
+        reading them; an empty store (first run or --full) is built from the
+        cases on the server.
+        """
+        if not self.config.get_diff_updates():
+            return False
+        return self.state_store is None or self.state_store.is_empty()
+
+    def _log_no_suite_to_diff(self):
+        # project.suite_name is optional for the sync by ID
+        self.logger.warning(
+            f"The suite '{self.config.get_test_suite()}' was not found, the test cases are updated without comparing them with TestRail"
+        )
+
+    def _get_case_changes(self, case_id, fields, existing_case, stats=None):
+        """
+        Returns the update_case payload to send for a case, None if it is up to date.
+
+        The case is up to date if the state store has the hash of the same
+        payload, or if the payload does not differ from the existing case.
+
+        Args:
+            case_id (int): The TestRail case ID.
+            fields (dict): Keyword arguments for update_test_case.
+            existing_case (dict): The case fetched from TestRail, None if unknown.
+            stats (CaseDiffStats): Counts the outcome.
+        """
+        payload = TestRailApiManager.build_update_case_payload(**fields)
+        if (
+            self.state_store is not None
+            and self.state_store.get(case_id) == get_payload_hash(payload)
+        ):
+            outcome, changes = "unchanged", None
+        elif existing_case is None or not self.config.get_diff_updates():
+            outcome, changes = "skipped", payload
+        else:
+            changes = diff_case(payload, existing_case, self.diff_fields)
+            outcome = "changed" if changes else "unchanged"
+            if not changes:
+                self._remember_case_state(case_id, fields)
+        if stats is not None:
+            stats.add(outcome)
+        return changes if outcome != "unchanged" else None
+
+    def _remember_case_state(self, case_id, fields):
+        """Stores the hash of the payload that TestRail now has for the case."""
+        if self.state_store is not None:
+            self.state_store.set(
+                case_id,
+                get_payload_hash(TestRailApiManager.build_update_case_payload(**fields)),
             )
 
+    def _update_test_case_if_changed(self, case_id, fields, existing_case, stats=None):
+        changes = self._get_case_changes(case_id, fields, existing_case, stats)
+        if changes is None:
+            self.logger.debug(f"TC unchanged: {fields.get('title')} | Case ID: C{case_id}")
+            return
+        self.tr_api.update_case_fields(case_id, changes, fields.get("title"))
+        self._remember_case_state(case_id, fields)
+
+    def _resolve(self, kind, name, resolver):
+        """
+        Resolves a name (email, priority, type, ...) to an ID once per process.
+
+        The result is memoized per (kind, name). Concurrent callers asking for
+        the same key wait for the first one instead of resolving it again.
+        Errors are not memoized.
+
+        Args:
+            kind (str): The kind of the name, e.g. "user".
+            name (str): The name to resolve.
+            resolver (callable): Function returning the ID for the name.
+
+        Returns:
+            The resolved ID.
+        """
+        key = (kind, name)
+        if key in self._resolved:
+            return self._resolved[key]
+        with self._resolve_lock:
+            key_lock = self._resolve_key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            if key not in self._resolved:
+                self._resolved[key] = resolver(name)
+            return self._resolved[key]
+
     def _get_case_type_id_by_name(self, case_type_name):
-        for case_type in self.case_types:
-            if case_type["name"] == case_type_name:
-                return case_type["id"]
-        return None
+        def find_case_type_id(name):
+            for case_type in self.case_types:
+                if case_type["name"] == name:
+                    return case_type["id"]
+            return None
+
+        return self._resolve("case_type", case_type_name, find_case_type_id)
 
     def _get_custom_automation_type(self, test):
         if test.get("custom_automation_type"):
@@ -658,11 +990,18 @@ class TestSyncManager:
         return None
     
     def _get_milestone_id_by_name(self, name):
-        milestones = self.milestones
-        for milestone in milestones:
-            if milestone["name"] == name:
-                return milestone["id"]
-        return None
+        def find_milestone_id(name):
+            for milestone in self.milestones:
+                if milestone["name"] == name:
+                    return milestone["id"]
+            return None
+
+        return self._resolve("milestone", name, find_milestone_id)
+
+    def _get_user_id_by_email(self, email):
+        return self._resolve(
+            "user", email, lambda email: self.tr_api.get_user_by_email(email)["id"]
+        )
     
 
     def _get_automatedby_id(self, test):
@@ -670,17 +1009,13 @@ class TestSyncManager:
             return test["custom_automatedby_id"]
 
         if test.get("custom_automatedby"):
-            email = test["custom_automatedby"]
-            user = self.tr_api.get_user_by_email(email)
-            return user["id"]
+            return self._get_user_id_by_email(test["custom_automatedby"])
 
         if self.config.get_default_automatedby_id():
             return self.config.get_default_automatedby_id()
 
         if self.config.get_default_automatedby():
-            email = self.config.get_default_automatedby()
-            user = self.tr_api.get_user_by_email(email)
-            return user["id"]
+            return self._get_user_id_by_email(self.config.get_default_automatedby())
 
         return None
 
@@ -692,316 +1027,503 @@ class TestSyncManager:
         return result
 
     def _get_priority_id_by_name(self, priority_name):
-        for priority in self.priorities:
-            if priority["name"] == priority_name:
-                return priority["id"]
-        return None
+        def find_priority_id(name):
+            for priority in self.priorities:
+                if priority["name"] == name:
+                    return priority["id"]
+            return None
+
+        return self._resolve("priority", priority_name, find_priority_id)
+
+    def _get_custom_field_options(self, custom_field, case_fields):
+        """
+        Returns the options of a dropdown custom field as a {name: id} dict.
+        """
+        def parse_options(custom_field):
+            options = {}
+            for case_field in case_fields:
+                if case_field["system_name"] == custom_field:
+                    custom_fields_list = (
+                        case_field["configs"][0]["options"]["items"]
+                    ).split("\n")
+                    for field in custom_fields_list:
+                        key_value_list = field.split(", ")
+                        options.setdefault(key_value_list[1], key_value_list[0])
+                    break
+            return options
+
+        return self._resolve("custom_field_options", custom_field, parse_options)
 
     def _get_custom_field_id_by_name_from_tr(
         self, custom_field, custom_field_name, case_fields
     ):
-        for case_field in case_fields:
-            if case_field["system_name"] == custom_field:
-                custom_fields_list = (
-                    case_field["configs"][0]["options"]["items"]
-                ).split("\n")
-
-                custom_fields_dict_list = []
-                for field in custom_fields_list:
-                    key_value_list = field.split(", ")
-                    custom_fields_dict_list.append(
-                        {"id": key_value_list[0], "name": key_value_list[1]}
-                    )
-                break
+        options = self._get_custom_field_options(custom_field, case_fields)
+        return options.get(custom_field_name)
 
-        for field in custom_fields_dict_list:
-            if field["name"] == custom_field_name:
-                return field["id"]
-        return None
+    def _get_local_section_paths(self, robot_tests):
+        """
+        Returns the formatted paths of all the sections needed for the robot tests.
 
-    def add_folders_to_testrail(
-        self, project_id, suite_id, robot_tests, source_control_link_root
-    ):
-        # Function to add all intermediate paths
-        def add_intermediate_paths(path, all_paths):
+        Intermediate folders are included. The paths are sorted by length, so
+        every parent comes before its children.
+        """
+        formatted_pathes = {test["formatted_path"] for test in robot_tests["tests"]}
+        # Process each path and add intermediate paths
+        for path in list(formatted_pathes):
             parts = path.split(" > ")
             for i in range(1, len(parts)):
-                intermediate_path = " > ".join(parts[:i])
-                if intermediate_path not in all_paths:
-                    all_paths.append(intermediate_path)
-
-        def get_github_link_to_folder_file(formatted_path, formatted_pathes):
-            count = str(formatted_pathes).count(formatted_path)
-            if count > 1:
-                source_control_link = f"{source_control_link_root}/{str(formatted_path).replace(' > ', os.sep)}"
-            else:
-                source_control_link = f"{source_control_link_root}/{str(formatted_path).replace(' > ', os.sep)}.robot"
-            return source_control_link
-
-        def get_parent_id_by_formatted_path(formatted_path):
-            sections = self.tr_api.get_sections(project_id, suite_id)["sections"]
-            local_path_list = formatted_path.split(" > ")
-            parent_id = None
-            for local_path in local_path_list:
-                matching_sections = [
-                    s
-                    for s in sections
-                    if s["name"] == local_path
-                    and (s["parent_id"] == parent_id or parent_id is None)
-                ]
-                if not matching_sections:
-                    return None
-                parent_id = matching_sections[0]["id"]
-            return parent_id
-
-        def create_sections(sections):
-            source_control_name = self.config.get_source_control_name()
-
-            def create_section(missing_path):
-                parent_id = get_parent_id_by_formatted_path(
-                    missing_path.rsplit(" > ", 1)[0]
-                )
-                source_control_link = get_github_link_to_folder_file(
-                    missing_path, sorted_formatted_local_pathes
-                )
-                description = (
-                    f"Link to the {source_control_name}:\n{source_control_link}"
+                formatted_pathes.add(" > ".join(parts[:i]))
+
+        return sorted(formatted_pathes, key=len)
+
+    def _get_folder_paths(self, local_section_paths):
+        """Returns the section paths that have subsections, i.e. the folders of the tests."""
+        return {
+            path.rsplit(" > ", 1)[0] for path in local_section_paths if " > " in path
+        }
+
+    def _get_section_description(
+        self, formatted_path, folder_paths, source_control_link_root
+    ):
+        if formatted_path in folder_paths:
+            source_control_link = f"{source_control_link_root}/{str(formatted_path).replace(' > ', os.sep)}"
+        else:
+            source_control_link = f"{source_control_link_root}/{str(formatted_path).replace(' > ', os.sep)}.robot"
+        description = f"Link to the {self.config.get_source_control_name()}:\n{source_control_link}"
+        root_test_section_name = self.config.get_root_test_section_name()
+        if formatted_path == root_test_section_name:
+            description = f"{root_test_section_name}\n\n{description}"
+        return description
+
+    def _add_section_by_path(
+        self, project_id, suite_id, section_index, formatted_path, description
+    ):
+        """Adds the section of the path under its parent and to the section index."""
+        parent_id = None
+        if " > " in formatted_path:
+            # the parent exists: it was created before its subsections
+            parent_id = section_index.get_id(formatted_path.rsplit(" > ", 1)[0])
+        section_name = formatted_path.split(">")[-1].strip()
+        return section_index.add(
+            self.tr_api.add_section(
+                project_id, suite_id, section_name, parent_id, description
+            )
+        )
+
+    def _update_section_by_path(self, section_index, formatted_path, description):
+        """
+        Updates the description of the section of the path if it changed.
+
+        Returns:
+            bool: True if the section was updated, False if its description
+                was already up to date.
+        """
+        try:
+            section = section_index.get(formatted_path)
+            section_name = formatted_path.split(">")[-1].strip()
+            if section.get("description") == description:
+                self.logger.debug(f"Section unchanged: {section_name}")
+                return False
+            is_root = formatted_path == self.config.get_root_test_section_name()
+            if is_root:
+                self.logger.info(
+                    f"Updating root section: '{section_name}' with description: '{description}'"
                 )
-                section_name = missing_path.split(">")[-1].strip()
-                self.tr_api.add_section(
-                    project_id, suite_id, section_name, parent_id, description
+            else:
+                self.logger.debug(
+                    f"Updating section: {section_name} with description: {description}"
                 )
+            self.tr_api.update_section(section["id"], section_name, description=description)
+            section["description"] = description
+            if not is_root:
+                self.logger.info(f"Section updated: {section_name}")
+            return True
+        except Exception as e:
+            self.logger.error(f"Error updating section '{formatted_path}': {e}")
+            raise
 
-            # add sections is parallel:
-            if self.max_workers:
-                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    self.logger.debug(
-                        f"Adding sections to TestRail\nThe following number of sections will be added: {len(sections)}"
-                    )
-                    executor.map(create_section, sections)
+    def _log_section_updates(self, results):
+        """Logs the counts of the results of _update_section_by_path, None for the failed updates."""
+        self.logger.info(
+            f"Section updates: updated: {results.count(True)}, unchanged (skipped): {results.count(False)}"
+        )
+
+    def _create_sections_after_parents(
+        self, create_section, missing_paths, on_created=None
+    ):
+        """
+        Creates the missing sections, each one as soon as its parent exists.
+
+        The sections are a tree of dependencies: a section whose parent is
+        also missing is submitted when add_section returned the parent, and
+        the others are submitted at once. There is no barrier between the
+        depth levels and no depth limit.
+
+        Args:
+            create_section (callable): Creates the section of a path.
+            missing_paths (list): The paths of the sections to create.
+            on_created (callable): Called with the path of every created
+                section, before its subsections are submitted.
+
+        Returns:
+            int: The number of sections that were not created, including the
+                subsections of a section that failed.
+        """
+        missing = set(missing_paths)
+        subsections = {}
+        ready = []
+        for path in missing_paths:
+            parent_path = path.rsplit(" > ", 1)[0] if " > " in path else None
+            if parent_path in missing:
+                subsections.setdefault(parent_path, []).append(path)
             else:
-                for missing_path in sections:
-                    create_section(missing_path)
-
-        def create_missing_sections():
-            missing_sections_pathes = []
-            for path in sorted_formatted_local_pathes:
-                if path not in [
-                    s["formatted_path"] for s in existing_sections_with_formatted_path
-                ]:
-                    missing_sections_pathes.append(path)
-            self.logger.info("Missing sections:\n%s", missing_sections_pathes)
-
-            levels = [[] for _ in range(6)]
-            for path in missing_sections_pathes:
-                levels[min(path.count(" > "), 5)].append(path)
-
-            for i, level in enumerate(levels):
-                if level:
-                    self.logger.info(f"Creating sections for level {i}:\n{level}")
-                    create_sections(level)
-
-        def update_existing_sections():
-            source_control_name = self.config.get_source_control_name()
-            root_test_section_name = self.config.get_root_test_section_name()
-
-            def update_section(existing_section_path):
-                try:
-                    parent_id = get_parent_id_by_formatted_path(
-                        existing_section_path.rsplit(" > ", 1)[0]
-                    )
-                    source_control_link = get_github_link_to_folder_file(
-                        existing_section_path, sorted_formatted_local_pathes
-                    )
-                    description = (
-                        f"Link to the {source_control_name}:\n{source_control_link}"
-                    )
-                    section_name = existing_section_path.split(">")[-1].strip()
-                    if existing_section_path == root_test_section_name:
-                        root_description = f"{root_test_section_name}\n\n{description}"
-                        section = self.tr_api.get_section_by_name(
-                            project_id, suite_id, root_test_section_name
-                        )
-                        self.logger.info(
-                            f"Updating root section: '{section_name}' with description: '{root_description}'"
-                        )
-                        self.tr_api.update_section(
-                            section["id"], section_name, description=root_description
-                        )
-                    else:
-                        section = self.tr_api.get_section_by_name_and_parent_id(
-                            project_id, suite_id, section_name, parent_id
-                        )
-                        self.logger.debug(
-                            f"Updating section: {section_name} with description: {description}"
+                ready.append(path)
+
+        def count_subsections(path):
+            return sum(
+                1 + count_subsections(child) for child in subsections.get(path, ())
+            )
+
+        failed = 0
+        max_workers = self.tr_api.governor.max_limit if self.max_workers else 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            pending = {executor.submit(create_section, path): path for path in ready}
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path = pending.pop(future)
+                    try:
+                        future.result()
+                    except Exception as e:
+                        skipped = count_subsections(path)
+                        failed += 1 + skipped
+                        self.logger.error(
+                            f"Error in create_section '{path}': {e}"
+                            + (f" ({skipped} subsections are not created)" if skipped else "")
                         )
-                        self.tr_api.update_section(
-                            section["id"], section_name, description=description
+                        continue
+                    if on_created is not None:
+                        on_created(path)
+                    for subsection_path in subsections.get(path, ()):
+                        pending[executor.submit(create_section, subsection_path)] = (
+                            subsection_path
                         )
-                        self.logger.info(f"Section updated: {section_name}")
-                except Exception as e:
-                    self.logger.error(
-                        f"Error updating section '{existing_section_path}': {e}"
-                    )
-                    raise
-
-            existing_section_pathes = []
-            for path in sorted_formatted_local_pathes:
-                if path in [
-                    s["formatted_path"] for s in existing_sections_with_formatted_path
-                ]:
-                    existing_section_pathes.append(path)
-            self.logger.info("Existing sections:\n%s", existing_section_pathes)
-
-            # update sections in parallel:
-            if self.max_workers:
-                with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                    self.logger.debug(
-                        f"Updating sections in TestRail\nThe following number of sections will be updated: {len(existing_section_pathes)}"
-                    )
-                    executor.map(update_section, existing_section_pathes)
-            else:
-                for path in existing_section_pathes:
-                    update_section(path)
+        if failed:
+            self.logger.error(f"{failed} of {len(missing_paths)} sections were not created")
+        return failed
 
-        formatted_pathes = [test["formatted_path"] for test in robot_tests["tests"]]
-        # Process each path and add intermediate paths
-        for path in formatted_pathes:
-            add_intermediate_paths(path, formatted_pathes)
+    def _get_section_paths_to_sync(self, local_section_paths, section_index):
+        """
+        Returns the local section paths that are missing in TestRail and the existing ones.
+
+        Returns:
+            tuple: The missing paths, parents first, and the existing paths.
+        """
+        missing_paths = [p for p in local_section_paths if p not in section_index]
+        existing_paths = [p for p in local_section_paths if p in section_index]
+        self.logger.info("Missing sections:\n%s", missing_paths)
+        self.logger.info("Existing sections:\n%s", existing_paths)
+        return missing_paths, existing_paths
+
+    @timed_phase("sections")
+    def add_folders_to_testrail(
+        self,
+        project_id,
+        suite_id,
+        robot_tests,
+        source_control_link_root,
+        section_index=None,
+        on_section_created=None,
+    ):
+        """
+        Creates the missing sections of the robot tests and updates the others.
 
-        # Remove duplicates and sort by length
-        sorted_formatted_local_pathes = sorted(list(set(formatted_pathes)), key=len)
-        existing_sections_with_formatted_path = (
-            self.tr_api.get_sections_with_formatted_path(project_id, suite_id)
+        Args:
+            section_index (SectionIndex): The sections of the suite, read from
+                TestRail if None. The created sections are added to it.
+            on_section_created (callable): Called with the path of every
+                created section, see _create_sections_after_parents.
+
+        Returns:
+            SectionIndex: The sections of the suite.
+        """
+        if section_index is None:
+            section_index = self.tr_api.get_section_index(project_id, suite_id)
+        local_section_paths = self._get_local_section_paths(robot_tests)
+        folder_paths = self._get_folder_paths(local_section_paths)
+        missing_paths, existing_paths = self._get_section_paths_to_sync(
+            local_section_paths, section_index
         )
 
-        create_missing_sections()
-        update_existing_sections()
+        def create_section(missing_path):
+            return self._add_section_by_path(
+                project_id,
+                suite_id,
+                section_index,
+                missing_path,
+                self._get_section_description(
+                    missing_path, folder_paths, source_control_link_root
+                ),
+            )
+
+        def update_section(existing_section_path):
+            return self._update_section_by_path(
+                section_index,
+                existing_section_path,
+                self._get_section_description(
+                    existing_section_path, folder_paths, source_control_link_root
+                ),
+            )
+
+        self.logger.debug(
+            f"Adding sections to TestRail\nThe following number of sections will be added: {len(missing_paths)}"
+        )
+        self._create_sections_after_parents(
+            create_section, missing_paths, on_section_created
+        )
+
+        # update sections in parallel:
+        if self.max_workers:
+            self.logger.debug(
+                f"Updating sections in TestRail\nThe following number of sections will be updated: {len(existing_paths)}"
+            )
+            results = self._run_in_parallel(update_section, existing_paths)
+        else:
+            results = [update_section(path) for path in existing_paths]
+        self._log_section_updates(results)
+        return section_index
+
+    def _get_name_sync_case_fields(self, test):
+        """
+        Returns the test case fields written by the sync by name.
+
+        Args:
+            test (dict): The robot test.
+
+        Returns:
+            dict: Keyword arguments for add_test_case and update_test_case.
+        """
+        return {
+            "title": test["title"],
+            "steps": test["rich_text_steps"],
+            "refs": test["refs"],
+            "priority_id": self._get_priority_id(test),
+            "custom_automation_type": self._get_custom_automation_type(test),
+            "type_id": self._get_type_id(test),
+            "estimate": test["estimate"],
+            "milestone_id": test.get("milestone_id"),
+            "preconditions": f'**[Tags]**\n{str(list(test["tags"]))}',
+            "custom_fields": test.get("custom_fields"),
+        }
 
+    def _add_test_case_by_name(self, test, section_index):
+        fields = dict(
+            self._get_name_sync_case_fields(test),
+            section_id=section_index.get_id(test["formatted_path"]),
+        )
+        case = self.tr_api.add_test_case(**fields)
+        self._remember_case_state(case["id"], fields)
+        self.logger.info(f"Test added: {test['title']}")
+
+    def _update_test_case_by_name(self, test, existing_case, section_index, stats=None):
+        self._update_test_case_if_changed(
+            existing_case["id"],
+            dict(
+                self._get_name_sync_case_fields(test),
+                section_id=section_index.get_id(test["formatted_path"]),
+            ),
+            existing_case,
+            stats,
+        )
+
+    @timed_phase("add")
     def add_tests_to_testrail(
-        self, project_id, suite_id, existing_tr_tests, robot_tests
+        self,
+        project_id,
+        suite_id,
+        existing_cases_by_title,
+        robot_tests,
+        section_index=None,
     ):
         # If the test with the particular name exists locally but NOT in the TestRail, then it will be added to the tests_to_add list
-        tests_to_add = []
-        for test in robot_tests["tests"]:
-            if test["title"] not in [t["title"] for t in existing_tr_tests]:
-                tests_to_add.append(test)
+        tests_to_add = [
+            test
+            for test in robot_tests["tests"]
+            if test["title"] not in existing_cases_by_title
+        ]
 
-        tr_sections = self.get_sections_with_formatted_path(project_id, suite_id)
+        if section_index is None:
+            section_index = self.tr_api.get_section_index(project_id, suite_id)
 
         def add_test(test):
-            section_id = next(
-                (
-                    s["id"]
-                    for s in tr_sections
-                    if s["formatted_path"] == test["formatted_path"]
-                ),
-                None,
-            )
-            preconditions = f'**[Tags]**\n{str(test["tags"])}'
-
-            self.tr_api.add_test_case(
-                section_id=section_id,
-                title=test["title"],
-                steps=test["rich_text_steps"],
-                refs=test["refs"],
-                priority_id=self._get_priority_id(test),
-                custom_automation_type=self._get_custom_automation_type(test),
-                type_id=self._get_type_id(test),
-                estimate=test["estimate"],
-                milestone_id=test["milestone_id"],
-                preconditions=preconditions,
-            )
-            self.logger.info(f"Test added: {test['title']}")
+            self._add_test_case_by_name(test, section_index)
 
         if self.max_workers:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                self.logger.debug(
-                    f"Adding tests to TestRail\nThe following number of tests will be added: {len(tests_to_add)}"
-                )
-                executor.map(add_test, tests_to_add)
+            self.logger.debug(
+                f"Adding tests to TestRail\nThe following number of tests will be added: {len(tests_to_add)}"
+            )
+            self._run_in_parallel(add_test, tests_to_add)
         else:
             for test in tests_to_add:
                 add_test(test)
 
 
+    @timed_phase("update")
     def update_tests_in_testrail(
-        self, project_id, suite_id, existing_tr_tests, robot_tests
+        self,
+        project_id,
+        suite_id,
+        existing_cases_by_title,
+        robot_tests,
+        section_index=None,
     ):
         # If the test with the particular name exists locally AND in the TestRail, then it will be added to the tests_to_update list
         tests_to_update = [
             test
             for test in robot_tests["tests"]
-            if test["title"] in [t["title"] for t in existing_tr_tests]
+            if test["title"] in existing_cases_by_title
         ]
 
-        tr_sections = self.get_sections_with_formatted_path(project_id, suite_id)
+        if section_index is None:
+            section_index = self.tr_api.get_section_index(project_id, suite_id)
 
-        def update_test(test):
-            section_id = next(
-                (
-                    s["id"]
-                    for s in tr_sections
-                    if s["formatted_path"] == test["formatted_path"]
-                ),
-                None,
-            )
-            case_id = next(
-                (c["id"] for c in existing_tr_tests if c["title"] == test["title"]),
-                None,
-            )
-            preconditions = f'**[Tags]**\n{str(test["tags"])}'
+        stats = CaseDiffStats()
 
-            self.tr_api.update_test_case(
-                case_id,
-                section_id=section_id,
-                title=test["title"],
-                steps=test["rich_text_steps"],
-                refs=test["refs"],
-                priority_id=self._get_priority_id(test),
-                custom_automation_type=self._get_custom_automation_type(test),
-                type_id=self._get_type_id(test),
-                estimate=test["estimate"],
-                milestone_id=test["milestone_id"],
-                preconditions=preconditions,
+        def update_test(test):
+            self._update_test_case_by_name(
+                test, existing_cases_by_title[test["title"]], section_index, stats
             )
 
         if self.max_workers:
-            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
-                self.logger.info(
-                    f"Updating tests in TestRail\nThe following number of tests will be updated: {len(tests_to_update)}"
-                )
-                executor.map(update_test, tests_to_update)
+            self.logger.info(
+                f"Updating tests in TestRail\nThe following number of tests will be updated: {len(tests_to_update)}"
+            )
+            self._run_in_parallel(update_test, tests_to_update)
         else:
             for test in tests_to_update:
                 update_test(test)
+        self.logger.info(f"Test case updates: {stats}")
+
+    @timed_phase("pipeline")
+    def sync_tests_by_name_pipelined(
+        self, project_id, suite_id, robot_tests, section_index, existing_cases_future
+    ):
+        """
+        Syncs the sections, test cases and orphans by name as one pipeline.
+
+        The add or update of a test is sent as soon as its section exists: at
+        once for the existing sections, and when add_section returned the
+        section for the missing ones. The section descriptions are updated
+        and the orphans are moved while the test cases are written, so the
+        sync takes about as long as its longest chain of writes instead of
+        the sum of the phases.
+
+        Args:
+            section_index (SectionIndex): The sections of the suite. The
+                created sections are added to it.
+            existing_cases_future (Future): The TestRail cases by title, see
+                _get_cases_by_title. Only the test case writes wait for it.
+        """
+        tests_by_path = {}
+        for test in robot_tests["tests"]:
+            tests_by_path.setdefault(test["formatted_path"], []).append(test)
+        stats = CaseDiffStats()
+
+        def sync_test(test):
+            existing_case = existing_cases_future.result().get(test["title"])
+            if existing_case is None:
+                self._add_test_case_by_name(test, section_index)
+            else:
+                self._update_test_case_by_name(test, existing_case, section_index, stats)
+
+        futures = []
+        max_workers = self.tr_api.governor.max_limit if self.max_workers else 1
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+
+            def dispatch_tests(formatted_path):
+                for test in tests_by_path.pop(formatted_path, ()):
+                    futures.append(executor.submit(sync_test, test))
+
+            futures.append(
+                executor.submit(
+                    self.move_orphan_tests_to_orphan_folder,
+                    project_id,
+                    suite_id,
+                    robot_tests,
+                    section_index,
+                )
+            )
+            for formatted_path in list(tests_by_path):
+                if formatted_path in section_index:
+                    dispatch_tests(formatted_path)
+            self.add_folders_to_testrail(
+                project_id,
+                suite_id,
+                robot_tests,
+                self.config.get_source_control_link(),
+                section_index,
+                on_section_created=dispatch_tests,
+            )
+
+        failed = 0
+        for future in futures:
+            try:
+                future.result()
+            except Exception as e:
+                failed += 1
+                self.logger.error(f"Error in the sync pipeline: {e}")
+        if failed:
+            self.logger.error(f"{failed} of {len(futures)} operations failed")
+        not_synced = sum(len(tests) for tests in tests_by_path.values())
+        if not_synced:
+            self.logger.error(
+                f"{not_synced} tests were not synced, their sections could not be created"
+            )
+        self.logger.info(f"Test case updates: {stats}")
 
-    def move_orphan_tests_to_orphan_folder(self, project_id, suite_id, robot_tests):
+    @timed_phase("orphans")
+    def move_orphan_tests_to_orphan_folder(
+        self, project_id, suite_id, robot_tests, section_index=None
+    ):
+        """
+        Moves the TestRail cases without a robot test to the orphan section.
+
+        Args:
+            section_index (SectionIndex): The sections of the suite, where
+                the orphan section is looked up by name at any depth, like
+                get_section_by_name. It is read from TestRail if None.
+        """
         # Define the name of the orphan folder
         orphan_folder_name = self.config.get_orphan_test_section_name()
         orphan_description = self.config.get_orphan_test_section_description()
 
-        existing_tr_tests = self.tr_api.get_cases(project_id, suite_id)["cases"]
-        robot_tests_titles = [t["title"] for t in robot_tests["tests"]]
+        robot_tests_titles = {t["title"] for t in robot_tests["tests"]}
         orphan_tests = []
-        for test in existing_tr_tests:
+        for test in self.tr_api.iter_cases(project_id, suite_id):
             if test["title"] not in robot_tests_titles:
-                orphan_tests.append(test)
+                orphan_tests.append({"id": test["id"], "title": test["title"]})
 
-        orphan_section = self.tr_api.get_section_by_name(
-            project_id, suite_id, orphan_folder_name
-        )
+        if section_index is not None:
+            orphan_section = section_index.get_by_name(orphan_folder_name)
+        else:
+            orphan_section = self.tr_api.get_section_by_name(
+                project_id, suite_id, orphan_folder_name
+            )
         if not orphan_tests and not orphan_section:
             pass
         elif orphan_tests and not orphan_section:
-            self.tr_api.add_section(
+            orphan_section = self.tr_api.add_section(
                 project_id, suite_id, orphan_folder_name, description=orphan_description
             )
+            if section_index is not None:
+                section_index.add(orphan_section)
         elif not orphan_tests and orphan_section:
             self.logger.info(
                 f'{orphan_folder_name} section is empty: {orphan_section["id"]} and there are no orphan tests. Deleting the section.'
             )
             self.tr_api.delete_section(orphan_section["id"])
+        elif orphan_section.get("description") == orphan_description:
+            self.logger.debug(f"Section unchanged: {orphan_folder_name}")
         else:
             self.tr_api.update_section(
                 orphan_section["id"], orphan_folder_name, orphan_description
@@ -1016,41 +1538,38 @@ class TestSyncManager:
 
         if orphan_tests:
             self.logger.warning(f"ORPHAN tests: {test_ids_with_prefix}")
-            orphan_section = self.tr_api.get_section_by_name(
-                project_id, suite_id, orphan_folder_name
-            )
             self.tr_api.move_cases_to_section(
                 suite_id, orphan_section["id"], formatted_tests_ids
             )
 
     def get_sections_with_formatted_path(self, project_id, suite_id):
-        sections = self.tr_api.get_sections(project_id, suite_id)["sections"]
-        for section in sections:
-            if section["parent_id"] is None:
-                section["formatted_path"] = section["name"]
-            else:
-                parent_formatted_path = next(
-                    (
-                        s["formatted_path"]
-                        for s in sections
-                        if s["id"] == section["parent_id"]
-                    ),
-                    None,
-                )
-                section["formatted_path"] = (
-                    f"{parent_formatted_path} > {section['name']}"
-                )
-
-        return sections
+        return self.tr_api.get_sections_with_formatted_path(project_id, suite_id)
 
-    def set_test_results(self, project_id, suite_id, test_run_id, output_file):
-        tr_test_cases = self.tr_api.get_cases(project_id, suite_id)
-        robot_tests = parse_robot_output_xml(output_file)
-        robot_tests = add_additional_info_to_parsed_robot_tests(robot_tests)
+    def set_test_results(
+        self, project_id, suite_id, test_run_id, output_file, results_uploader=None
+    ):
+        # Only the fields needed to map results are kept from the streamed pages
+        case_ids_by_title = {
+            title: case["id"]
+            for title, case in self._get_cases_by_title(
+                {"id": case["id"], "title": case["title"]}
+                for case in self.tr_api.iter_cases(project_id, suite_id)
+            ).items()
+        }
+        robot_tests = self._iter_robot_tests_from_output(output_file)
+
+        if results_uploader is None:
+            results_uploader = ResultsUploader(self.tr_api, self.config, "results_by_name")
+            results_uploader.load_run_id(output_file)
+            results_uploader.start(test_run_id)
+        with self.metrics.phase("results"):
+            results_uploader.upload(
+                test_run_id, self._iter_results_by_title(robot_tests, case_ids_by_title)
+            )
 
-        results = []
-        for test in robot_tests["tests"]:
-            case_id = self._get_tr_case_id_by_title(test["title"], tr_test_cases)
+    def _iter_results_by_title(self, robot_tests, case_ids_by_title):
+        for test in robot_tests:
+            case_id = self._get_tr_case_id_by_title(test["title"], case_ids_by_title)
             status_id = self._get_testrail_status_by_robot_status(test["test_status"])
             self.logger.info(f"Test case: {test['title']} | Status: {status_id}")
 
@@ -1061,10 +1580,9 @@ class TestSyncManager:
 
             assignedto_id = None
             if self.config.get_test_run_assignedto_email():
-                user = self.tr_api.get_user_by_email(
+                assignedto_id = self._get_user_id_by_email(
                     self.config.get_test_run_assignedto_email()
                 )
-                assignedto_id = user["id"]
 
             status_id = self._get_testrail_status_by_robot_status(test["test_status"])
             comment = test.get("status_message") or None
@@ -1073,21 +1591,14 @@ class TestSyncManager:
             defects = test.get("defects") or None
             assignedto_id = assignedto_id or None
             # milestone_id = milestone_id
-            results.append(
-                {
-                    "case_id": case_id,
-                    "status_id": status_id,
-                    "comment": comment,
-                    "elapsed": elapsed,
-                    "version": version,
-                    "defects": defects,
-                }
-            )
-
-        self.tr_api.add_results_for_cases(test_run_id, {"results": results})
-
-    def _get_tr_case_id_by_title(self, title, test_cases):
-        for case in test_cases["cases"]:
-            if case["title"] == title:
-                return case["id"]
-        return None
+            yield {
+                "case_id": case_id,
+                "status_id": status_id,
+                "comment": comment,
+                "elapsed": elapsed,
+                "version": version,
+                "defects": defects,
+            }
+
+    def _get_tr_case_id_by_title(self, title, case_ids_by_title):
+        return case_ids_by_title.get(title)
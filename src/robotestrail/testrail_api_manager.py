@@ -1,6 +1,37 @@
 import os
+import time
 import requests
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
 from robotestrail.logging_config import setup_logging
+from robotestrail.metadata_cache import MetadataCache
+from robotestrail.metrics import Metrics
+from robotestrail.section_index import SectionIndex
+from robotestrail.single_flight import SingleFlight
+from robotestrail.sync_journal import SyncJournal
+from robotestrail.rate_governor import (
+    RateGovernor,
+    THROTTLE_STATUS_CODES,
+    parse_retry_after,
+)
+
+# GET endpoints whose data is changed by a write endpoint
+INVALIDATED_BY_WRITE = {
+    "add_section": ("get_sections",),
+    "update_section": ("get_sections",),
+    "delete_section": ("get_sections", "get_cases"),
+    "add_case": ("get_cases",),
+    "update_case": ("get_cases",),
+    "move_cases_to_section": ("get_cases",),
+    "add_plan": ("get_plans",),
+    "add_plan_entry": ("get_plans",),
+}
+
+
+def get_endpoint_name(url):
+    """Returns the API method of a TestRail URL, e.g. "get_cases"."""
+    path = url.split("/api/v2/", 1)[-1]
+    return path.split("&", 1)[0].split("/", 1)[0]
 
 
 class TestRailApiManager:
@@ -13,60 +44,222 @@ class TestRailApiManager:
             self.api_key = os.getenv(self.config.get_testrail_api_key_env_var())
         except Exception as e:
             self.logger.error(f"Error getting TestRail API key from environment variable: {e}")
+        self.timeout = (
+            self.config.get_testrail_connect_timeout(),
+            self.config.get_testrail_read_timeout(),
+        )
+        self.session = self._create_session()
+        self.single_flight = SingleFlight()
+        self.metrics = Metrics(enabled=self.config.get_metrics_enabled())
+        self.journal = SyncJournal(
+            self.config.get_journal_path(),
+            enabled=self.config.get_journal_enabled(),
+            resume=self.config.get_resume(),
+        )
+        self.metadata_cache = MetadataCache(
+            self.config.get_metadata_cache_path(),
+            self.base_url,
+            self.user,
+            ttl=self.config.get_metadata_cache_ttl(),
+            enabled=self.config.get_metadata_cache_enabled(),
+            refresh=self.config.get_refresh_cache(),
+        )
+        self.governor = RateGovernor(
+            initial_limit=self.config.get_max_workers() or 1,
+            min_limit=self.config.get_testrail_min_concurrency(),
+            max_limit=self.config.get_testrail_max_concurrency(),
+            adaptive=self.config.get_testrail_adaptive_concurrency(),
+            max_retries=self.config.get_testrail_max_retries(),
+            backoff_base=self.config.get_testrail_backoff_base(),
+            backoff_max=self.config.get_testrail_backoff_max(),
+        )
         self.logger.debug("TestRailApiManager initialized")
 
-    def get_project_id(self):
-        url = f"{self.base_url}/index.php?/api/v2/get_projects"
-        response = requests.get(url, auth=(self.user, self.api_key))
+    def _create_session(self):
+        """
+        Creates a requests session shared by all the worker threads.
+
+        The underlying urllib3 pool is thread-safe, so one session sized to the
+        number of workers lets every request reuse an open keep-alive connection
+        instead of paying for a new TCP+TLS handshake.
+        """
+        pool_size = self.config.get_testrail_pool_size()
+        session = requests.Session()
+        session.auth = (self.user, self.api_key)
+        adapter = HTTPAdapter(
+            pool_connections=1, pool_maxsize=pool_size, pool_block=True
+        )
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        if not self.config.get_testrail_keep_alive():
+            session.headers["Connection"] = "close"
+        self.logger.debug(f"HTTP session created with pool size {pool_size}")
+        return session
+
+    def _request(self, method, url, **kwargs):
+        """
+        Sends a request through the rate governor.
+
+        Throttled responses (429/503) are retried after the Retry-After delay or
+        a jittered exponential backoff. The last response is returned when the
+        retries are exhausted so the caller reports the error as before.
+        """
+        kwargs.setdefault("timeout", self.timeout)
+        endpoint = get_endpoint_name(url)
+        attempt = 0
+        while True:
+            self.governor.acquire()
+            start = time.monotonic()
+            try:
+                response = self.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                self.metrics.record_request(endpoint, "error", time.monotonic() - start)
+                raise
+            finally:
+                self.governor.release()
+            self.metrics.record_request(
+                endpoint,
+                response.status_code,
+                time.monotonic() - start,
+                len(response.request.body or b"") if response.request is not None else 0,
+                len(response.content),
+            )
+
+            if response.status_code not in THROTTLE_STATUS_CODES:
+                self.governor.on_success()
+                return response
+
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            self.governor.on_throttle(retry_after)
+            if attempt >= self.governor.max_retries:
+                self.logger.error(
+                    f"Giving up after {attempt} retries: {method} {url} | Status Code: {response.status_code}"
+                )
+                return response
+
+            delay = self.governor.retry_delay(attempt, retry_after)
+            self.metrics.record_retry(endpoint)
+            self.logger.warning(
+                f"TestRail responded with {response.status_code}, retrying in {delay:.1f}s: {method} {url}"
+            )
+            time.sleep(delay)
+            attempt += 1
+
+    def _get(self, url, **kwargs):
+        # Identical concurrent GETs share one request
+        return self.single_flight.do(
+            url, lambda: self._request("GET", url, **kwargs)
+        )
+
+    def _post(self, url, **kwargs):
+        endpoint = get_endpoint_name(url)
+        journal_key, replayed = self.journal.before_call(endpoint, url, kwargs.get("json"))
+        if replayed is not None:
+            return replayed
+        try:
+            response = self._request("POST", url, **kwargs)
+        finally:
+            for invalidated in INVALIDATED_BY_WRITE.get(endpoint, ()):
+                self.single_flight.forget(f"{self.base_url}/index.php?/api/v2/{invalidated}")
+        self.journal.after_call(endpoint, journal_key, response)
+        return response
+
+    def close(self):
+        self.session.close()
+
+    def _get_page(self, url):
+        response = self._get(url)
         response.raise_for_status()
         self.logger.debug(response.json())
-        projects = response.json()['projects']
-        for project in projects:
+        return response.json()
+
+    def _iter_pages(self, url, key, prefetch=None):
+        """
+        Yields the items of a paginated TestRail endpoint one by one.
+
+        TestRail returns at most 250 items per page and a `_links.next` link to
+        the following page. When prefetch is enabled the next page is requested
+        in the background while the items of the current page are consumed.
+
+        Args:
+            url (str): URL of the first page.
+            key (str): Name of the list in the response, e.g. "cases".
+            prefetch (bool): Fetch the next page ahead. Defaults to the config value.
+
+        Yields:
+            dict: The items of all pages.
+        """
+        if prefetch is None:
+            prefetch = self.config.get_testrail_prefetch_pages()
+
+        with ThreadPoolExecutor(max_workers=1) as executor:
+            page = self._get_page(url)
+            while True:
+                # Older TestRail versions return a plain list without pagination
+                if isinstance(page, list):
+                    yield from page
+                    return
+
+                next_link = (page.get("_links") or {}).get("next")
+                next_page = None
+                if next_link and prefetch:
+                    next_page = executor.submit(
+                        self._get_page, f"{self.base_url}/index.php?{next_link}"
+                    )
+
+                yield from page.get(key, [])
+
+                if not next_link:
+                    return
+                if next_page is not None:
+                    page = next_page.result()
+                else:
+                    page = self._get_page(f"{self.base_url}/index.php?{next_link}")
+
+    def _get_metadata(self, endpoint, key=None):
+        """
+        Returns the response of a metadata endpoint, using the metadata cache.
+
+        Args:
+            endpoint (str): The endpoint with its arguments, e.g. "get_milestones/1".
+            key (str): Name of the list for paginated endpoints. All the pages
+                are read and returned as {key: [...]}.
+        """
+        data = self.metadata_cache.get(endpoint)
+        if data is not None:
+            return data
+
+        url = f"{self.base_url}/index.php?/api/v2/{endpoint}"
+        if key:
+            data = {key: list(self._iter_pages(url, key))}
+        else:
+            data = self._get_page(url)
+        self.metadata_cache.set(endpoint, data)
+        return data
+
+    def get_project_id(self):
+        for project in self.get_projects()["projects"]:
             if project['name'] == self.config.get_project_name():
                 return project['id']
         return None
     
     def get_case_fields(self):
-        url = f"{self.base_url}/index.php?/api/v2/get_case_fields"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._get_metadata("get_case_fields")
     
     def get_case_types(self):
-        url = f"{self.base_url}/index.php?/api/v2/get_case_types"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._get_metadata("get_case_types")
     
     def get_priorities(self):
-        url = f"{self.base_url}/index.php?/api/v2/get_priorities"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._get_metadata("get_priorities")
     
     def get_statuses(self):
-        url = f"{self.base_url}/index.php?/api/v2/get_statuses"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._get_metadata("get_statuses")
     
     def get_result_fields(self):
-        url = f"{self.base_url}/index.php?/api/v2/get_result_fields"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._get_metadata("get_result_fields")
 
     def get_milestones(self, project_id):
-        url = f"{self.base_url}/index.php?/api/v2/get_milestones/{project_id}"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._get_metadata(f"get_milestones/{project_id}", "milestones")
     
     def get_milestone_id_by_name(self, project_id, name):
         milestones = self.get_milestones(project_id)["milestones"]
@@ -76,16 +269,10 @@ class TestRailApiManager:
         return None
     
     def get_projects(self):
-        url = f"{self.base_url}/index.php?/api/v2/get_projects"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._get_metadata("get_projects", "projects")
 
-    def update_test_case(self, case_id, title=None, steps=None, custom_automation_type=None, custom_customer=None, custom_automatedby=None, section_id=None, preconditions=None, refs=None, priority_id=None, type_id=None, estimate=None, milestone_id=None):
-        url = f"{self.base_url}/index.php?/api/v2/update_case/{case_id}"
-        headers = {"Content-Type": "application/json"}
-        
+    @staticmethod
+    def build_update_case_payload(title=None, steps=None, custom_automation_type=None, custom_customer=None, custom_automatedby=None, section_id=None, preconditions=None, refs=None, priority_id=None, type_id=None, estimate=None, milestone_id=None, custom_fields=None):
         data = {
             "title": title,
             "section_id": section_id,
@@ -100,16 +287,46 @@ class TestRailApiManager:
             "estimate": estimate,
             "milestone_id": milestone_id
         }
+        # custom fields of the tag rules, e.g. {"custom_severity": 2}
+        data.update(custom_fields or {})
 
         payload = {}
         for key, value in data.items():
             if value:
                 payload[key] = value
+        return payload
 
-        self.logger.debug(f"Updating test case: {title} | Case ID: {case_id}")
-        response = requests.post(
-            url, json=payload, auth=(self.user, self.api_key), headers=headers
+    def update_test_case(self, case_id, title=None, steps=None, custom_automation_type=None, custom_customer=None, custom_automatedby=None, section_id=None, preconditions=None, refs=None, priority_id=None, type_id=None, estimate=None, milestone_id=None, custom_fields=None):
+        payload = self.build_update_case_payload(
+            title=title,
+            steps=steps,
+            custom_automation_type=custom_automation_type,
+            custom_customer=custom_customer,
+            custom_automatedby=custom_automatedby,
+            section_id=section_id,
+            preconditions=preconditions,
+            refs=refs,
+            priority_id=priority_id,
+            type_id=type_id,
+            estimate=estimate,
+            milestone_id=milestone_id,
+            custom_fields=custom_fields,
         )
+        self.update_case_fields(case_id, payload, title)
+
+    def update_case_fields(self, case_id, payload, title=None):
+        """
+        Sends an update_case payload as is, e.g. only the fields that changed.
+
+        Args:
+            case_id (int): The TestRail case ID.
+            payload (dict): TestRail case fields, see build_update_case_payload.
+            title (str): The title of the case, used for logging only.
+        """
+        url = f"{self.base_url}/index.php?/api/v2/update_case/{case_id}"
+        headers = {"Content-Type": "application/json"}
+        self.logger.debug(f"Updating test case: {title} | Case ID: {case_id}")
+        response = self._post(url, json=payload, headers=headers)
         if response.status_code == 200:
             self.logger.info(f"TC updated: {title} | Case ID: C{case_id}")
         else:
@@ -119,11 +336,11 @@ class TestRailApiManager:
             )
 
     def get_test_plans(self, project_id):
+        return {"plans": list(self.iter_test_plans(project_id))}
+
+    def iter_test_plans(self, project_id, prefetch=None):
         url = f"{self.base_url}/index.php?/api/v2/get_plans/{project_id}"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._iter_pages(url, "plans", prefetch)
     
     def add_plan(self, project_id, name, description=None, milestone_id=None, entries=None):
         url = f"{self.base_url}/index.php?/api/v2/add_plan/{project_id}"
@@ -134,7 +351,7 @@ class TestRailApiManager:
             "milestone_id": milestone_id,
             "entries": entries
         }
-        response = requests.post(url, auth=(self.user, self.api_key), headers=headers, json=data)
+        response = self._post(url, headers=headers, json=data)
         if response.status_code == 200:
             self.logger.info(f"Test plan created: {name}")
             return response.json()
@@ -146,15 +363,14 @@ class TestRailApiManager:
 
 
     def get_tr_test_plan_by_name(self, project_id, name):
-        test_plans = self.get_test_plans(project_id)["plans"]
-        for test_plan in test_plans:
+        for test_plan in self.iter_test_plans(project_id):
             if test_plan["name"] == name:
                 return test_plan
         return None
     
     def get_tr_suite_by_name(self, project_id, suite_name):
         url = f"{self.base_url}/index.php?/api/v2/get_suites/{project_id}"
-        response = requests.get(url, auth=(self.user, self.api_key))
+        response = self._get(url)
         response.raise_for_status()
         suites = response.json()
         for suite in suites:
@@ -176,7 +392,7 @@ class TestRailApiManager:
             "refs": refs
         }
         self.logger.info(f"Request Data: {data}")
-        response = requests.post(url, auth=(self.user, self.api_key), headers=headers, json=data)
+        response = self._post(url, headers=headers, json=data)
         #response.raise_for_status()
         if response.status_code == 200:
             self.logger.info(response.json())
@@ -190,7 +406,7 @@ class TestRailApiManager:
     def add_results_for_cases(self, run_id, payload):
         url = f"{self.base_url}/index.php?/api/v2/add_results_for_cases/{run_id}"
         headers = {"Content-Type": "application/json"}
-        response = requests.post(url, auth=(self.user, self.api_key), headers=headers, json=payload)
+        response = self._post(url, headers=headers, json=payload)
         if response.status_code == 200:
             self.logger.info(f"Results added to test run: {run_id}")
             self.logger.debug(f"Response: {response.json()}")
@@ -202,38 +418,37 @@ class TestRailApiManager:
         
     def get_user_by_email(self, email):
         url = f"{self.base_url}/index.php?/api/v2/get_user_by_email&email={email}"
-        response = requests.get(url, auth=(self.user, self.api_key))
+        response = self._get(url)
         response.raise_for_status()
         self.logger.debug(response.json())
         return response.json()
     
     def get_current_user(self):
         url = f"{self.base_url}/index.php?/api/v2/get_current_user/"
-        response = requests.get(url, auth=(self.user, self.api_key))
+        response = self._get(url)
         response.raise_for_status()
         self.logger.debug(response.json())
         return response.json()
     
     def get_cases(self, project_id, suite_id):
+        return {"cases": list(self.iter_cases(project_id, suite_id))}
+
+    def iter_cases(self, project_id, suite_id, prefetch=None):
         url = f"{self.base_url}/index.php?/api/v2/get_cases/{project_id}&suite_id={suite_id}"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._iter_pages(url, "cases", prefetch)
     
     def get_section_by_name(self, project_id, suite_id, name):
-        sections = self.get_sections(project_id, suite_id)["sections"]
-        for section in sections:
+        for section in self.iter_sections(project_id, suite_id):
             if section["name"] == name:
                 return section
         return None
     
     def get_sections(self, project_id, suite_id):
+        return {"sections": list(self.iter_sections(project_id, suite_id))}
+
+    def iter_sections(self, project_id, suite_id, prefetch=None):
         url = f"{self.base_url}/index.php?/api/v2/get_sections/{project_id}&suite_id={suite_id}"
-        response = requests.get(url, auth=(self.user, self.api_key))
-        response.raise_for_status()
-        self.logger.debug(response.json())
-        return response.json()
+        return self._iter_pages(url, "sections", prefetch)
         
     def add_section(self, project_id, suite_id, section_name, parent_id=None, description=None):
         url = f"{self.base_url}/index.php?/api/v2/add_section/{project_id}"
@@ -244,9 +459,7 @@ class TestRailApiManager:
             "description": description,  # Optional: Add a description to the section
             "parent_id": parent_id,  # Optional: If adding a subsection, specify the parent section ID
         }
-        response = requests.post(
-            url, auth=(self.user, self.api_key), headers=headers, json=data
-        )
+        response = self._post(url, headers=headers, json=data)
         if response.status_code == 200:
             section = response.json()
             self.logger.info(f"Section added: '{section_name}' with ID {section['id']}")
@@ -257,8 +470,7 @@ class TestRailApiManager:
             )
         
     def get_section_by_name_and_parent_id(self, project_id, suite_id, name, parent_id):
-        sections = self.get_sections(project_id, suite_id)["sections"]
-        for section in sections:
+        for section in self.iter_sections(project_id, suite_id):
             if section["name"] == name and section["parent_id"] == parent_id:
                 return section
         return None
@@ -271,9 +483,7 @@ class TestRailApiManager:
             "name": section_name,
             "description": description,
         }
-        response = requests.post(
-            url, auth=(self.user, self.api_key), headers=headers, json=data
-        )
+        response = self._post(url, headers=headers, json=data)
         if response.status_code == 200:
             section = response.json()
             self.logger.debug(f"Section updated: '{section_name}' | S{section['id']} | {section['description']}")
@@ -283,24 +493,13 @@ class TestRailApiManager:
                 f"Failed to update section: {response.status_code} {response.text}"
             )
         
+    def get_section_index(self, project_id, suite_id):
+        return SectionIndex(self.iter_sections(project_id, suite_id))
+
     def get_sections_with_formatted_path(self, project_id, suite_id):
-        sections = self.get_sections(project_id, suite_id)["sections"]
-        for section in sections:
-            if section["parent_id"] is None:
-                section["formatted_path"] = section["name"]
-            else:
-                parent_formatted_path = next(
-                    (
-                        s["formatted_path"]
-                        for s in sections
-                        if s["id"] == section["parent_id"]
-                    ),
-                    None,
-                )
-                section["formatted_path"] = f"{parent_formatted_path} > {section['name']}"
-        return sections
+        return self.get_section_index(project_id, suite_id).sections
     
-    def add_test_case(self, section_id, title, steps, custom_automation_type, refs=None, priority_id=None, type_id=None, estimate=None, milestone_id=None, preconditions=None):
+    def add_test_case(self, section_id, title, steps, custom_automation_type, refs=None, priority_id=None, type_id=None, estimate=None, milestone_id=None, preconditions=None, custom_fields=None):
         url = f"{self.base_url}/index.php?/api/v2/add_case/{section_id}"
         headers = {"Content-Type": "application/json"}
         data = {
@@ -314,7 +513,8 @@ class TestRailApiManager:
             "milestone_id": milestone_id,
             "custom_preconds": preconditions
         }
-        response = requests.post(url, auth=(self.user, self.api_key), headers=headers, json=data)
+        data.update(custom_fields or {})
+        response = self._post(url, headers=headers, json=data)
         if response.status_code == 200:
             case = response.json()
             self.logger.debug(f"Test case added: '{title}' | C{case['id']}")
@@ -326,7 +526,7 @@ class TestRailApiManager:
         
     def delete_section(self, section_id):
         url = f"{self.base_url}/index.php?/api/v2/delete_section/{section_id}"
-        response = requests.post(url, auth=(self.user, self.api_key))
+        response = self._post(url)
         if response.status_code == 200:
             self.logger.info(f"Section deleted: S{section_id}")
         else:
@@ -341,9 +541,7 @@ class TestRailApiManager:
             "suite_id": suite_id,
             "case_ids": case_ids
         }
-        response = requests.post(
-            url, auth=(self.user, self.api_key), headers=headers, json=data
-        )
+        response = self._post(url, headers=headers, json=data)
         if response.status_code == 200:
             self.logger.info(f"Tests moved to ORPHAN: {case_ids}")
         else: